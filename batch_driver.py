@@ -0,0 +1,273 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import downsample
+import profiling
+import resample
+from signal_io import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB, OUTPUT_FORMATS, output_path_for
+
+# 输出目录下的处理清单文件名
+MANIFEST_NAME = '.batch_manifest.json'
+
+# 每个工作进程的基础内存估计（解释器、numpy/scipy 以及流式处理的分块缓冲）
+JOB_BASE_MEMORY = 256 << 20
+# 数据读入内存时每字节文本输入的内存估计：float64 数组约为文本的 1/3，FFT 重采样另需复数中间结果和输出
+PARSED_MEMORY_RATIO = 0.5
+FFT_MEMORY_RATIO = 2.0
+
+# 各工具的输出文件名前缀和单文件处理函数
+TOOLS = {
+    'downsample': ('downsampled_', downsample.downsample_file),
+    'resample': ('resampled_', resample.resample_file),
+}
+
+def _file_state(path):
+    """文件的修改时间和大小，用于判断输出是否最新"""
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+def available_memory():
+    """可用物理内存字节数，无法获取时返回 None"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def estimate_job_memory(input_size, params, cache_dir):
+    """估计处理一个输入文件时工作进程的峰值内存"""
+    ratio = 0.0
+    if cache_dir is None:
+        ratio += PARSED_MEMORY_RATIO
+    if params.get('method') == 'fft':
+        ratio += FFT_MEMORY_RATIO
+    return JOB_BASE_MEMORY + int(input_size * ratio)
+
+def default_workers(jobs, params, cache_dir):
+    """按 CPU 核数和可用内存确定进程数：同时运行的最大文件也不超过可用内存"""
+    workers = min(os.cpu_count() or 1, len(jobs))
+    memory = available_memory()
+    if memory and jobs:
+        largest = max(job['input_size'] for job in jobs)
+        workers = min(workers, memory // estimate_job_memory(largest, params, cache_dir))
+    return max(1, workers)
+
+class Manifest:
+    """输出目录下的处理清单
+    
+    按输出文件名记录输入文件状态、处理参数和输出文件状态，每完成一个文件就原子写回，
+    中断后重新运行时跳过已完成且未变化的文件。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.entries = json.load(f).get('files', {})
+            except (OSError, ValueError) as e:
+                print(f"处理清单 {path} 无法读取，将重新处理所有文件: {e}")
+    
+    def is_up_to_date(self, job, params):
+        """输入和参数与清单记录一致、输出文件存在且修改时间和大小未变时视为最新"""
+        entry = self.entries.get(os.path.basename(job['output_path']))
+        if not entry or entry['params'] != params or entry['input'] != job['input_state']:
+            return False
+        try:
+            return _file_state(job['output_path']) == entry['output']
+        except OSError:
+            return False
+    
+    def record(self, job, params, result):
+        self.entries[os.path.basename(job['output_path'])] = {
+            'input': job['input_state'],
+            'params': params,
+            'output': _file_state(result['output_path']),
+            'samples': result['samples'],
+            'output_samples': result['output_samples'],
+            'seconds': round(result['seconds'], 3),
+        }
+        self.save()
+    
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+def list_jobs(tool, input_dir, output_dir, output_format):
+    """输入目录下的所有TXT文件及其输出路径，按文件大小从大到小排列，使进程池负载更均衡"""
+    prefix = TOOLS[tool][0]
+    jobs = []
+    for filename in os.listdir(input_dir):
+        input_path = os.path.join(input_dir, filename)
+        if not filename.lower().endswith('.txt') or not os.path.isfile(input_path):
+            continue
+        state = _file_state(input_path)
+        jobs.append({
+            'name': filename,
+            'input_path': input_path,
+            'output_path': output_path_for(os.path.join(output_dir, f"{prefix}{filename}"), output_format),
+            'input_state': state,
+            'input_size': state['size'],
+        })
+    return sorted(jobs, key=lambda job: (-job['input_size'], job['name']))
+
+def _run_job(tool, job, params, cache_dir, cache_size):
+    """工作进程任务：处理一个文件，失败时返回错误信息"""
+    start = time.perf_counter()
+    try:
+        with profiling.stage('process_file', file=job['name']):
+            output_path, samples, output_samples = TOOLS[tool][1](
+                job['input_path'], job['output_path'], cache_dir=cache_dir, cache_size=cache_size, **params)
+    except Exception as e:
+        return {'error': str(e), 'pid': os.getpid()}
+    return {
+        'output_path': output_path,
+        'samples': samples,
+        'output_samples': output_samples,
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid(),
+    }
+
+def run_batch(tool, input_dir, output_dir, params, cache_dir=DEFAULT_CACHE_DIR, workers=None, force=False,
+              cache_size=DEFAULT_CACHE_MB):
+    """
+    在进程池中并行处理输入目录下的所有TXT文件，跳过清单中已是最新的输出
+    :param tool: downsample / resample
+    :param params: 传给单文件处理函数的参数（不含输入输出路径和缓存设置），同时记入清单
+    :param workers: 进程数，None 表示按 CPU 核数和可用内存自动确定
+    :param force: 忽略清单，重新处理所有文件
+    :param cache_size: 解析缓存总大小上限(MB)，超过时按最近使用时间淘汰
+    :return: 汇总信息 {'processed', 'skipped', 'failed', 'samples', 'seconds', 'workers'}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_NAME))
+    jobs = list_jobs(tool, input_dir, output_dir, params['output_format'])
+    
+    pending = [job for job in jobs if force or not manifest.is_up_to_date(job, params)]
+    skipped = len(jobs) - len(pending)
+    profiling.count('files_skipped', skipped)
+    if skipped:
+        print(f"跳过 {skipped} 个已是最新的文件")
+    if not pending:
+        print("没有需要处理的文件")
+        return {'processed': 0, 'skipped': skipped, 'failed': 0, 'samples': 0, 'seconds': 0.0, 'workers': {}}
+    
+    if workers is None:
+        workers = default_workers(pending, params, cache_dir)
+    workers = max(1, min(workers, len(pending)))
+    print(f">>> {tool}: {len(pending)} 个文件, {workers} 个进程 <<<")
+    
+    processed = failed = 0
+    per_worker = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=profiling.configure,
+                             initargs=(profiling.get_config(),)) as pool:
+        futures = {pool.submit(_run_job, tool, job, params, cache_dir, cache_size): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            result = future.result()
+            if 'error' in result:
+                failed += 1
+                print(f"处理文件 {job['name']} 时出错: {result['error']}")
+                continue
+            
+            processed += 1
+            manifest.record(job, params, result)
+            profiling.count('files_processed')
+            profiling.count('samples', result['samples'])
+            stats = per_worker.setdefault(result['pid'], {'files': 0, 'samples': 0, 'seconds': 0.0})
+            stats['files'] += 1
+            stats['samples'] += result['samples']
+            stats['seconds'] += result['seconds']
+            rate = result['samples'] / result['seconds'] if result['seconds'] > 0 else 0
+            print(f"成功处理: {job['name']} -> {os.path.basename(result['output_path'])} "
+                  f"(原始点数: {result['samples']}, 输出点数: {result['output_samples']}, "
+                  f"用时 {result['seconds']:.2f}s, {rate:,.0f} 点/秒)")
+    elapsed = time.perf_counter() - start
+    
+    summary = {
+        'processed': processed,
+        'skipped': skipped,
+        'failed': failed,
+        'samples': sum(stats['samples'] for stats in per_worker.values()),
+        'seconds': elapsed,
+        'workers': per_worker,
+    }
+    print_summary(summary)
+    return summary
+
+def print_summary(summary):
+    """打印每个工作进程及总体的吞吐量"""
+    for index, (pid, stats) in enumerate(sorted(summary['workers'].items()), start=1):
+        rate = stats['samples'] / stats['seconds'] if stats['seconds'] > 0 else 0
+        print(f"  进程 {index} (pid {pid}): {stats['files']} 个文件, {stats['samples']} 点, "
+              f"用时 {stats['seconds']:.2f}s, {rate:,.0f} 点/秒")
+    rate = summary['samples'] / summary['seconds'] if summary['seconds'] > 0 else 0
+    print(f"完成: 处理 {summary['processed']} 个, 跳过 {summary['skipped']} 个, 失败 {summary['failed']} 个; "
+          f"总用时 {summary['seconds']:.2f}s, 总吞吐 {rate:,.0f} 点/秒")
+
+def _add_tool_arguments(parser, tool):
+    parser.add_argument("input_dir", help="输入文件夹路径")
+    parser.add_argument("output_dir", help="输出文件夹路径（处理清单也保存在这里）")
+    if tool == 'downsample':
+        parser.add_argument("--factor", type=int, required=True, help="降采样因子(如 10000Hz→2000Hz 需要 5)")
+        parser.add_argument("--mode", choices=downsample.MODES, default="slice",
+                            help="slice 直接抽取；decimate 先做抗混叠滤波再抽取 (默认: slice)")
+    else:
+        parser.add_argument("--original-rate", type=float, required=True, help="原始采样率(Hz)")
+        parser.add_argument("--target-rate", type=float, required=True, help="目标采样率(Hz)")
+        parser.add_argument("--method", choices=resample.METHODS, default="fft",
+                            help="fft 整段 FFT 重采样；poly 流式多相重采样 (默认: fft)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="txt", help="输出格式 (默认: txt)")
+    parser.add_argument("--workers", type=int, help="并行处理的进程数 (默认: 按 CPU 核数和可用内存自动确定)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用解析缓存")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"解析缓存目录 (默认: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_MB, help=f"解析缓存大小上限MB (默认: {DEFAULT_CACHE_MB})")
+    parser.add_argument("--force", action="store_true", help="忽略处理清单，重新处理所有文件")
+    profiling.add_arguments(parser)
+
+def build_parser(tool=None):
+    """tool 为 None 时以子命令选择工具，否则只解析该工具的参数（供 downsample.py / resample.py 直接调用）"""
+    import argparse
+    if tool is not None:
+        parser = argparse.ArgumentParser(description=f"信号批量处理工具: {tool}")
+        _add_tool_arguments(parser, tool)
+        parser.set_defaults(tool=tool)
+        return parser
+    
+    parser = argparse.ArgumentParser(description="信号批量处理工具（并行、可断点续跑）")
+    subparsers = parser.add_subparsers(dest="tool", required=True)
+    _add_tool_arguments(subparsers.add_parser("downsample", help="批量降采样"), 'downsample')
+    _add_tool_arguments(subparsers.add_parser("resample", help="批量重采样"), 'resample')
+    return parser
+
+def main(argv=None, tool=None):
+    """命令行入口，返回退出码：有文件处理失败时为 1"""
+    args = build_parser(tool).parse_args(argv)
+    if args.tool == 'downsample':
+        params = {'downsample_factor': args.factor, 'output_format': args.format, 'mode': args.mode}
+    else:
+        params = {'original_rate': args.original_rate, 'target_rate': args.target_rate,
+                  'output_format': args.format, 'method': args.method}
+    
+    with profiling.session(args.profile, args.tool, args.profile_stage):
+        summary = run_batch(args.tool, args.input_dir, args.output_dir, params,
+                            cache_dir=None if args.no_cache else args.cache_dir,
+                            workers=args.workers, force=args.force, cache_size=args.cache_size)
+    return 1 if summary['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+import check
+import compare_excel
+import downsample
+import report
+import resample
+from signal_io import SignalWriter
+from writers import FORMATS
+
+# 工作簿基准的总行数和默认工作表数
+SIZES = (10_000, 100_000, 1_000_000, 5_000_000)
+DEFAULT_SHEETS = 4
+# 每个工作表的数据行数上限（Excel 1048576 行减去表头）
+SHEET_MAX_ROWS = 1048575
+
+# 信号基准的总样本数（1 亿点的文本约 2.6GB），每个目录拆成 SIGNAL_FILES 个文件
+SIGNAL_SIZES = (1_000_000, 10_000_000, 100_000_000)
+SIGNAL_FILES = 4
+SIGNAL_RATE = 10000
+
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'excel_benchmark')
+DEFAULT_HISTORY = 'benchmark_history.json'
+
+# 与上一次运行相比，用时增加超过该比例时标记为退化
+REGRESSION_THRESHOLD = 0.10
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RNS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PNS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_CT = 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+
+# 合成数据的取值：G 300 个、H 2000 个不同值，Q 约一半为零
+G_VALUES = [f"G{i:04d}" for i in range(300)]
+H_VALUES = [f"HHHHHH-{i:05d}-x{i % 7}" for i in range(2000)]
+Q_VALUES = ['0', '0', '0', '1.25', '3', '-2.5']
+HEADER = (('A', '序号'), ('G', 'G'), ('H', 'H'), ('L', 'L'), ('M', 'M'), ('Q', 'Q'), ('R', 'R'))
+BLOCK_ROWS = 10000
+
+def _shared_strings_xml():
+    """共享字符串表：G 的普通文本、G 的富文本（分段 <r>，解析后与普通文本相同）、H 的普通文本"""
+    items = [f'<si><t>{escape(g)}</t></si>' for g in G_VALUES]
+    items += [f'<si><r><t>{escape(g[:2])}</t></r><r><rPr><b/></rPr><t>{escape(g[2:])}</t></r></si>'
+              for g in G_VALUES]
+    items += [f'<si><t>{escape(h)}</t></si>' for h in H_VALUES]
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<sst xmlns="{_NS}" count="{len(items)}" uniqueCount="{len(items)}">{"".join(items)}</sst>')
+
+def _sheet_rows(rows, rng, change_last=False):
+    """逐块产出工作表行的 XML，G 列 90% 普通共享字符串、5% 富文本共享字符串、5% 内联字符串；
+    L 列约 2% 为空，Q 与 R 列取值相同（check.py 读 Q 列，report.py 按列序读 R 列）"""
+    h_base = 2 * len(G_VALUES)
+    header = ''.join(f'<c r="{col}1" t="inlineStr"><is><t>{escape(name)}</t></is></c>' for col, name in HEADER)
+    yield f'<row r="1">{header}</row>'
+    
+    for start in range(0, rows, BLOCK_ROWS):
+        n = min(BLOCK_ROWS, rows - start)
+        g = rng.integers(0, len(G_VALUES), n)
+        g_kind = rng.random(n)
+        h = rng.integers(0, len(H_VALUES), n) + h_base
+        l_values = rng.integers(50, 151, n)
+        l_empty = rng.random(n) < 0.02
+        m = rng.integers(0, 2, n)
+        q = rng.integers(0, len(Q_VALUES), n)
+        
+        parts = []
+        for i in range(n):
+            r = start + i + 2
+            if g_kind[i] < 0.90:
+                g_cell = f'<c r="G{r}" t="s"><v>{g[i]}</v></c>'
+            elif g_kind[i] < 0.95:
+                g_cell = f'<c r="G{r}" t="s"><v>{g[i] + len(G_VALUES)}</v></c>'
+            else:
+                g_cell = f'<c r="G{r}" t="inlineStr"><is><t>{G_VALUES[g[i]]}</t></is></c>'
+            l_cell = '' if l_empty[i] else f'<c r="L{r}"><v>{l_values[i]}</v></c>'
+            q_value = Q_VALUES[q[i]]
+            if change_last and start + i == rows - 1:
+                q_value = '7.5'
+            parts.append(
+                f'<row r="{r}"><c r="A{r}"><v>{r - 1}</v></c>{g_cell}<c r="H{r}" t="s"><v>{h[i]}</v></c>'
+                f'{l_cell}<c r="M{r}"><v>{m[i]}</v></c><c r="Q{r}"><v>{q_value}</v></c>'
+                f'<c r="R{r}"><v>{q_value}</v></c></row>'
+            )
+        yield ''.join(parts)
+
+def generate_workbook(path, rows, sheets=DEFAULT_SHEETS, seed=0, change_last=False):
+    """
+    生成与实际数据结构相同的合成工作簿，直接写 xlsx 的 XML 部件，内存占用与行数无关
+    :param rows: 所有工作表的数据总行数，单表超过 Excel 行数上限时自动增加工作表数
+    :param change_last: 为 True 时修改第一个工作表最后一行的 Q/R 值，用于生成比较基准的对照文件
+    :return: 实际的工作表数
+    """
+    sheets = max(sheets, -(-rows // SHEET_MAX_ROWS))
+    per_sheet = [rows // sheets + (i < rows % sheets) for i in range(sheets)]
+    rng = np.random.default_rng(seed)
+    
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as z:
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i + 1}.xml" ContentType="{_CT}.worksheet+xml"/>'
+            for i in range(sheets)
+        )
+        z.writestr('[Content_Types].xml',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   f'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   f'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   f'<Default Extension="xml" ContentType="application/xml"/>'
+                   f'<Override PartName="/xl/workbook.xml" ContentType="{_CT}.sheet.main+xml"/>{overrides}'
+                   f'<Override PartName="/xl/sharedStrings.xml" ContentType="{_CT}.sharedStrings+xml"/></Types>')
+        z.writestr('_rels/.rels',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PNS}">'
+                   f'<Relationship Id="rId1" Type="{_RNS}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        z.writestr('xl/workbook.xml',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><workbook xmlns="{_NS}" xmlns:r="{_RNS}"><sheets>'
+                   + ''.join(f'<sheet name="数据{i + 1}" sheetId="{i + 1}" r:id="rId{i + 1}"/>' for i in range(sheets))
+                   + '</sheets></workbook>')
+        z.writestr('xl/_rels/workbook.xml.rels',
+                   f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PNS}">'
+                   + ''.join(f'<Relationship Id="rId{i + 1}" Type="{_RNS}/worksheet" Target="worksheets/sheet{i + 1}.xml"/>'
+                             for i in range(sheets))
+                   + f'<Relationship Id="rId{sheets + 1}" Type="{_RNS}/sharedStrings" Target="sharedStrings.xml"/>'
+                   + '</Relationships>')
+        z.writestr('xl/sharedStrings.xml', _shared_strings_xml())
+        
+        for i, n in enumerate(per_sheet):
+            with z.open(f'xl/worksheets/sheet{i + 1}.xml', 'w', force_zip64=True) as f:
+                f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><worksheet xmlns="{_NS}"><sheetData>'.encode())
+                for block in _sheet_rows(n, rng, change_last and i == 0):
+                    f.write(block.encode())
+                f.write(b'</sheetData></worksheet>')
+    os.replace(tmp_path, path)
+    return sheets
+
+def generate_signal(path, samples, columns=1, seed=0, rate=SIGNAL_RATE):
+    """生成合成信号文本（两个正弦分量加噪声），按块写出，内存占用与样本数无关"""
+    rng = np.random.default_rng(seed)
+    chunk = 1 << 20
+    with SignalWriter(path, 'txt') as writer:
+        for start in range(0, samples, chunk):
+            t = np.arange(start, min(start + chunk, samples)) / rate
+            x = np.sin(2 * np.pi * 50 * t) + 0.3 * np.sin(2 * np.pi * 1500 * t)
+            x = x[:, None] + 0.05 * rng.standard_normal((len(t), columns))
+            writer.write(x if columns > 1 else x[:, 0])
+
+def prepare_workbooks(data_dir, rows, sheets):
+    """生成（或复用已生成的）基准工作簿及其对照文件，返回 (路径, 对照路径, 实际工作表数)"""
+    base = os.path.join(data_dir, f"workbook_{rows}_{sheets}")
+    path, other = f"{base}.xlsx", f"{base}_b.xlsx"
+    actual_sheets = max(sheets, -(-rows // SHEET_MAX_ROWS))
+    for target, change_last in ((path, False), (other, True)):
+        if not os.path.exists(target):
+            print(f"生成工作簿: {target} ({rows} 行, {actual_sheets} 个工作表)")
+            generate_workbook(target, rows, sheets, change_last=change_last)
+    return path, other, actual_sheets
+
+def prepare_signals(data_dir, samples, files=SIGNAL_FILES):
+    """生成（或复用已生成的）信号目录，总样本数平均分到 files 个文件中"""
+    folder = os.path.join(data_dir, f"signal_{samples}")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        path = os.path.join(folder, f"signal_{i}.txt")
+        if not os.path.exists(path):
+            print(f"生成信号: {path}")
+            generate_signal(path, samples // files + (i < samples % files), seed=i)
+    return folder
+
+# 被测入口函数捕获异常后只打印错误信息，基准函数按其返回值检查，失败时抛出，由 run_case 记为错误而不是计时结果
+def _bench_deep_scan(inputs, options):
+    if not check.deep_scan_excel(inputs['workbook'], workers=options['workers'], fmt=options['format']):
+        raise RuntimeError("deep_scan_excel 扫描失败")
+
+def _bench_process_all_sheets(inputs, options):
+    if not report.process_all_sheets(inputs['workbook'], fmt=options['format'], workers=options['workers']):
+        raise RuntimeError("process_all_sheets 处理失败")
+
+def _bench_compare_excel(inputs, options):
+    # 只比较第一个工作表，吞吐量按该表行数计算
+    if compare_excel.compare_excel(inputs['workbook'], inputs['other']) is None:
+        raise RuntimeError("compare_excel 比较出错")
+    return inputs['first_sheet_rows']
+
+def _bench_stream_compare(inputs, options):
+    compare_excel.stream_compare(inputs['workbook'], inputs['other'], find_all=True)
+    return inputs['first_sheet_rows']
+
+def _check_signal_batch(name, summary):
+    """批量信号处理的结果检查：有文件失败或没有处理任何文件时抛出，否则返回处理的样本总数"""
+    if summary['failed'] or not summary['processed']:
+        raise RuntimeError(f"{name}: {summary['failed']} 个文件处理失败, 成功 {summary['processed']} 个")
+    return summary['samples']
+
+def _bench_downsample(inputs, options):
+    summary = downsample.batch_downsample_txt_files(inputs['signal_dir'], inputs['output_dir'], 5, cache_dir=None)
+    return _check_signal_batch('batch_downsample_txt_files', summary)
+
+def _bench_resample(inputs, options):
+    summary = resample.batch_resample_txt_files(inputs['signal_dir'], inputs['output_dir'], SIGNAL_RATE, 2000,
+                                                cache_dir=None)
+    return _check_signal_batch('batch_resample_txt_files', summary)
+
+# 基准名 -> (输入类型, 基准函数)；基准函数返回实际处理的行数，返回 None 时按输入总行数计
+BENCHMARKS = {
+    'deep_scan_excel': ('xlsx', _bench_deep_scan),
+    'process_all_sheets': ('xlsx', _bench_process_all_sheets),
+    'compare_excel': ('xlsx', _bench_compare_excel),
+    'stream_compare': ('xlsx', _bench_stream_compare),
+    'batch_downsample_txt_files': ('signal', _bench_downsample),
+    'batch_resample_txt_files': ('signal', _bench_resample),
+}
+
+def _peak_rss_mb():
+    """当前进程及其已结束子进程的峰值 RSS (MB)，无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_case(name, inputs, options):
+    """在独立进程中运行一个基准，屏蔽被测函数的输出，返回用时、实际处理的行数和峰值内存"""
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        rows = BENCHMARKS[name][1](inputs, options)
+    return {'seconds': time.perf_counter() - start, 'rows': rows, 'peak_rss_mb': _peak_rss_mb()}
+
+def run_case(name, inputs, options):
+    """每次运行都使用新启动的进程，峰值内存互不影响；进程异常退出（如内存不足）时记为错误"""
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            return pool.submit(_run_case, name, inputs, options).result()
+    except BrokenProcessPool:
+        return {'error': '基准进程异常退出（可能内存不足）'}
+    except Exception as e:
+        return {'error': str(e)}
+
+def _git_revision():
+    """当前代码的 git 版本（含未提交修改时加 -dirty），不是 git 仓库时返回 None"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{revision}-dirty" if dirty else revision
+
+def run_benchmarks(names, sizes, signal_sizes, sheets=DEFAULT_SHEETS, data_dir=DEFAULT_DATA_DIR,
+                   workers=1, fmt='xlsx', repeat=1):
+    """依次运行所选基准，每个规模取 repeat 次中用时最短的一次，返回结果列表"""
+    options = {'workers': workers, 'format': fmt}
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    
+    cases = []
+    for name in names:
+        kind = BENCHMARKS[name][0]
+        for rows in (sizes if kind == 'xlsx' else signal_sizes):
+            cases.append((name, kind, rows))
+    
+    for name, kind, rows in cases:
+        if kind == 'xlsx':
+            workbook, other, actual_sheets = prepare_workbooks(data_dir, rows, sheets)
+            inputs = {'workbook': workbook, 'other': other, 'first_sheet_rows': -(-rows // actual_sheets)}
+        else:
+            actual_sheets = None
+            inputs = {'signal_dir': prepare_signals(data_dir, rows),
+                      'output_dir': os.path.join(data_dir, f"signal_{rows}_{name}_output")}
+        
+        runs = [run_case(name, inputs, options) for _ in range(repeat)]
+        ok = [run for run in runs if 'error' not in run]
+        entry = {'benchmark': name, 'rows': rows, 'sheets': actual_sheets}
+        if ok:
+            best = min(ok, key=lambda run: run['seconds'])
+            processed = best['rows'] or rows
+            entry.update(
+                rows_processed=processed,
+                seconds=round(best['seconds'], 3),
+                peak_rss_mb=round(best['peak_rss_mb'], 1) if best['peak_rss_mb'] is not None else None,
+                rows_per_s=round(processed / best['seconds']) if best['seconds'] > 0 else None,
+            )
+        else:
+            entry['error'] = runs[0]['error']
+        results.append(entry)
+        print_result(entry)
+    return results
+
+def print_result(entry):
+    size = f"{entry['rows']:,} 行" + (f"/{entry['sheets']} 表" if entry['sheets'] else '')
+    if 'error' in entry:
+        print(f"  {entry['benchmark']:<28} {size:>18}  出错: {entry['error']}")
+        return
+    rss = f"{entry['peak_rss_mb']:.0f}MB" if entry['peak_rss_mb'] is not None else '-'
+    print(f"  {entry['benchmark']:<28} {size:>18}  {entry['seconds']:9.2f}s  峰值 {rss:>8}  "
+          f"{entry['rows_per_s'] or 0:>12,} 行/秒")
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def append_history(path, run):
+    """追加一次运行记录到 JSON 历史文件（原子替换）"""
+    history = load_history(path)
+    history.append(run)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return history
+
+def compare_runs(history, current, threshold=REGRESSION_THRESHOLD):
+    """将本次结果与历史中同一 (基准, 行数, 工作表数) 的最近一次成功结果对比，打印对比表并返回退化条目"""
+    regressions = []
+    print("\n与历史结果对比:")
+    for entry in current['results']:
+        if 'error' in entry:
+            continue
+        key = (entry['benchmark'], entry['rows'], entry['sheets'])
+        previous = next(((run, old) for run in reversed(history) if run is not current
+                         for old in run['results']
+                         if 'error' not in old and (old['benchmark'], old['rows'], old['sheets']) == key), None)
+        if previous is None:
+            continue
+        run, old = previous
+        ratio = entry['seconds'] / old['seconds'] if old['seconds'] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  ← 退化'
+            regressions.append(entry)
+        print(f"  {entry['benchmark']:<28} {entry['rows']:>12,} 行  {old['seconds']:9.2f}s → "
+              f"{entry['seconds']:9.2f}s  ({ratio:.2f}x, 对比 {run.get('revision') or '-'} @ {run['timestamp']}){flag}")
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="性能基准：合成数据上测量各脚本的用时、峰值内存和吞吐量")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="只运行这些基准 (默认: 全部)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES),
+                        help=f"工作簿总行数 (默认: {' '.join(map(str, SIZES))})")
+    parser.add_argument("--sheets", type=int, default=DEFAULT_SHEETS, help=f"工作表数 (默认: {DEFAULT_SHEETS})")
+    parser.add_argument("--signal-sizes", nargs="+", type=int, default=list(SIGNAL_SIZES),
+                        help=f"信号总样本数 (默认: {' '.join(map(str, SIGNAL_SIZES))})")
+    parser.add_argument("--workers", type=int, default=1, help="传给被测函数的进程数 (默认: 1)")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), default="xlsx",
+                        help="deep_scan_excel / process_all_sheets 的结果格式 (默认: xlsx)")
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模重复次数，取最短用时 (默认: 1)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR,
+                        help=f"合成数据目录，已生成的数据会复用 (默认: {DEFAULT_DATA_DIR})")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help=f"JSON 历史文件 (默认: {DEFAULT_HISTORY})")
+    parser.add_argument("--label", help="本次运行的说明，记入历史")
+    args = parser.parse_args()
+    
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': _git_revision(),
+        'label': args.label,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'options': {'sheets': args.sheets, 'workers': args.workers, 'format': args.format, 'repeat': args.repeat},
+    }
+    print(f">>> 性能基准 (版本: {run['revision'] or '-'}) <<<")
+    run['results'] = run_benchmarks(args.only or list(BENCHMARKS), args.sizes, args.signal_sizes,
+                                    args.sheets, args.data_dir, args.workers, args.format, args.repeat)
+    
+    history = append_history(args.history, run)
+    print(f"\n结果已追加到 {args.history}")
+    if len(history) > 1:
+        regressions = compare_runs(history, history[-1])
+        if regressions:
+            print(f"\n⚠ {len(regressions)} 项用时增加超过 {REGRESSION_THRESHOLD:.0%}")
+            sys.exit(1)
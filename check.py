@@ -1,206 +1,536 @@
+import glob
+import hashlib
 import zipfile
-import xml.etree.ElementTree as ET
+import numpy as np
 import pandas as pd
-import re
 import os
+import pickle
 import sys
 from tqdm import tqdm
-from collections import defaultdict
+import profiling
+from gl_index import GLIndex
+from writers import FORMATS, detect_format, write_frame
+from xlsx_reader import (
+    SharedStrings, build_workbook_index, get_cell_token, get_sheet_files, iter_sheet_rows, resolve_token,
+    sheet_pool, submit_largest_first, worker_zip
+)
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
-def get_sheet_files(zip_ref):
-    """获取所有工作表XML文件路径"""
-    return [name for name in zip_ref.namelist() 
-            if 'worksheets/sheet' in name.lower() and name.endswith('.xml')]
+# 扫描时需要读取的列
+SCAN_COLUMNS = ('G', 'H', 'L', 'Q')
 
-def parse_sheet_number(filename):
-    """从文件名提取工作表序号"""
-    match = re.search(r'sheet(\d+)\.xml', filename, re.IGNORECASE)
-    return int(match.group(1)) if match else -1
+# 扫描缓存默认位置和大小上限(MB)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'excel_check')
+DEFAULT_CACHE_MB = 256
 
-def get_sheet_name(zip_ref, sheet_num):
-    """获取实际工作表名称"""
+def iter_q_rows(sheet_stream):
+    """流式扫描工作表，逐行产出Q列非零行的 (G, H, L, Q) 原始值
+
+    第一个含单元格的行视为表头，不参与统计；G/H/L 仅在Q列非零时才取值。
+    共享字符串以索引形式产出，由调用方在扫描结束后统一解析；
+    Q列为共享字符串时无法当场判断是否为零，同样原样产出。
+    """
+    header_seen = False
+    for _, cells, ns in iter_sheet_rows(sheet_stream, SCAN_COLUMNS):
+        if not header_seen:
+            header_seen = True
+            continue
+        
+        q_cell = cells.get('Q')
+        if q_cell is None:
+            continue
+        
+        q_val = get_cell_token(q_cell, ns)
+        if isinstance(q_val, int) or (q_val and q_val not in ('0', '0.0')):
+            yield (
+                get_cell_token(cells.get('G'), ns),
+                get_cell_token(cells.get('H'), ns),
+                get_cell_token(cells.get('L'), ns),
+                q_val,
+            )
+
+def _reduce_sheet_batch(values, g_codes, h_codes, l_values, positions):
+    """将一个工作表的列式批数据按 (G, H) 取最小L值，返回列式部分聚合结果
+    
+    positions 为各行在表内的顺序号，结果按每个组合首行的顺序号排列（pos 列），
+    之后补入的行按原位置插回，保持逐行扫描时的首次出现顺序。
+    L 为 NaN 的行只计入组合、不参与取最小值，与逐行比较的结果一致。
+    """
+    batch = pd.DataFrame({
+        'g': np.asarray(g_codes, dtype=np.int32),
+        'h': np.asarray(h_codes, dtype=np.int32),
+        'l': np.asarray(l_values, dtype=np.float64),
+        'pos': np.asarray(positions, dtype=np.int64)
+    })
+    batch['l'] = batch['l'].fillna(np.inf)
+    reduced = batch.groupby(['g', 'h'], sort=False).agg(l=('l', 'min'), pos=('pos', 'min'))
+    reduced = reduced.reset_index().sort_values('pos', kind='stable')
+    return {
+        'values': list(values),
+        'g': reduced['g'].to_numpy(np.int32),
+        'h': reduced['h'].to_numpy(np.int32),
+        'l': reduced['l'].to_numpy(np.float64),
+        'pos': reduced['pos'].to_numpy(np.int64)
+    }
+
+def scan_sheet(zip_ref, sheet_file):
+    """扫描单个工作表，返回该表的列式部分聚合结果
+    
+    G/H 按本表字典编码为整数，values 为编码对应的原始值（共享字符串为索引），
+    g/h/l 为每个 (G, H) 组合在本表中的最小L值，按首次出现顺序排列。
+    pending 为 Q 或 L 列是共享字符串、需解析后才能判断的行 (顺序号, G, H, L, Q)；
+    出错时保留出错前已读取的数据，error 为错误信息，否则为 None。
+    """
+    values = {}
+    g_codes = array('i')
+    h_codes = array('i')
+    l_values = array('d')
+    positions = array('q')
+    pending = []
+    found_non_zero = False
+    error = None
     try:
-        with zip_ref.open('xl/workbook.xml') as f:
-            workbook = ET.parse(f).getroot()
-            ns = {'ns': workbook.tag.split('}')[0].strip('{')} if '}' in workbook.tag else {'ns': ''}
-            for sheet in workbook.findall('.//ns:sheets/ns:sheet', ns):
-                if sheet.get('sheetId') == str(sheet_num + 1):
-                    return sheet.get('name')
+        with zip_ref.open(sheet_file) as f, profiling.stage('scan_sheet', part=sheet_file):
+            for seq, (g_val, h_val, l_val, q_val) in enumerate(iter_q_rows(profiling.timed_stream(f))):
+                if isinstance(q_val, int) or isinstance(l_val, int):
+                    pending.append((seq, g_val, h_val, l_val, q_val))
+                    continue
+                
+                found_non_zero = True  # 标记找到非零值
+                
+                try:
+                    l_num = float(l_val) if l_val else float('inf')
+                except ValueError:
+                    continue
+                
+                g_codes.append(values.setdefault(g_val, len(values)))
+                h_codes.append(values.setdefault(h_val, len(values)))
+                l_values.append(l_num)
+                positions.append(seq)
+            profiling.count('matched_rows', len(l_values) + len(pending))
     except Exception as e:
-        print(f"获取工作表名称错误: {e}")
-    return f"sheet{sheet_num}"
-
-def get_cell_value(cell, shared_strings, ns):
-    """获取单元格值，优化处理各种类型"""
-    if cell is None:
-        return ''
-    
-    if cell.get('t') == 'inlineStr':
-        is_node = cell.find('.//ns:is', ns)
-        if is_node is not None:
-            t_node = is_node.find('.//ns:t', ns)
-            return t_node.text if t_node is not None else ''
-    
-    elif cell.get('t') == 's':
-        v_node = cell.find('.//ns:v', ns)
-        if v_node is not None:
+        error = str(e)
+    
+    result = _reduce_sheet_batch(values, g_codes, h_codes, l_values, positions)
+    result.update(pending=pending, found_non_zero=found_non_zero, error=error)
+    return result
+
+def collect_shared_refs(sheet_results):
+    """收集各工作表扫描结果中引用到的共享字符串索引"""
+    wanted = set()
+    for result in sheet_results:
+        wanted.update(token for token in result['values'] if isinstance(token, int))
+        for row in result['pending']:
+            wanted.update(token for token in row[1:] if isinstance(token, int))
+    return wanted
+
+def resolve_sheet_partial(result, shared_strings):
+    """将单个工作表扫描结果中的共享字符串索引解析为文本，返回 (partial, found_non_zero)
+    
+    待解析行按顺序号插回，解析后不同编码可能对应相同文本，由 aggregate_partials 统一去重。
+    """
+    values = [resolve_token(token, shared_strings) for token in result['values']]
+    g_codes = array('i', result['g'])
+    h_codes = array('i', result['h'])
+    l_values = array('d', result['l'])
+    positions = array('q', result['pos'])
+    
+    found_non_zero = result['found_non_zero']
+    for seq, g_val, h_val, l_val, q_val in result['pending']:
+        q_val = resolve_token(q_val, shared_strings)
+        if not q_val or q_val in ('0', '0.0'):
+            continue
+        found_non_zero = True
+        
+        l_val = resolve_token(l_val, shared_strings)
+        try:
+            l_num = float(l_val) if l_val else float('inf')
+        except ValueError:
+            continue
+        
+        g_codes.append(len(values))
+        values.append(resolve_token(g_val, shared_strings))
+        h_codes.append(len(values))
+        values.append(resolve_token(h_val, shared_strings))
+        l_values.append(l_num)
+        positions.append(seq)
+    
+    return _reduce_sheet_batch(values, g_codes, h_codes, l_values, positions), found_non_zero
+
+def aggregate_partials(partials, source_names):
+    """向量化合并各工作表的部分聚合结果
+    
+    partials 与 source_names 一一对应，并按合并顺序（工作簿顺序）排列。
+    返回 (gh_data, gh_sources)：
+    gh_data 每个 (G, H) 一行，含最小L值 min_l 和出现次数 count（含该组合的工作表数），
+    行顺序与逐表合并时的首次出现顺序一致；gh_sources 为 (G, H, source) 长表，列出最小L值所在的工作表。
+    """
+    frames = []
+    all_values = []
+    for sheet_id, partial in enumerate(partials):
+        offset = len(all_values)
+        all_values.extend(partial['values'])
+        frames.append(pd.DataFrame({
+            'g': partial['g'].astype(np.int64) + offset,
+            'h': partial['h'].astype(np.int64) + offset,
+            'l': partial['l'],
+            'sheet': sheet_id
+        }))
+    
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if rows.empty:
+        return (pd.DataFrame(columns=['G', 'H', 'min_l', 'count']),
+                pd.DataFrame(columns=['G', 'H', 'source']))
+    
+    # 各表的局部字典合并为全局字典编码
+    value_codes, uniques = pd.factorize(pd.Series(all_values, dtype=object))
+    rows['g'] = value_codes[rows['g'].to_numpy()]
+    rows['h'] = value_codes[rows['h'].to_numpy()]
+    
+    # 同一工作表内相同G-H组合只计一次
+    per_sheet = rows.groupby(['sheet', 'g', 'h'], sort=False)['l'].min().reset_index()
+    
+    grouped = per_sheet.groupby(['g', 'h'], sort=False)
+    per_sheet['min_l'] = grouped['l'].transform('min')
+    gh = grouped.agg(min_l=('l', 'min'), count=('sheet', 'size')).reset_index()
+    at_min = per_sheet[per_sheet['l'] == per_sheet['min_l']]
+    
+    names = np.asarray(source_names, dtype=object)
+    gh_data = pd.DataFrame({
+        'G': uniques.take(gh['g'].to_numpy()),
+        'H': uniques.take(gh['h'].to_numpy()),
+        'min_l': gh['min_l'].to_numpy(),
+        'count': gh['count'].to_numpy()
+    })
+    gh_sources = pd.DataFrame({
+        'G': uniques.take(at_min['g'].to_numpy()),
+        'H': uniques.take(at_min['h'].to_numpy()),
+        'source': names[at_min['sheet'].to_numpy()]
+    })
+    return gh_data, gh_sources
+
+def merge_gl(gh_data, gh_sources):
+    """第二阶段：合并相同G和最小L值的记录，返回最终结果表
+    
+    H 和来源工作表按字典序拼接，行顺序为 (G, 最小L值) 的首次出现顺序。
+    """
+    columns = ['G', 'H', '最小L值', '出现次数', '来源工作表']
+    gh_data = gh_data[gh_data['min_l'] != np.inf]
+    if gh_data.empty:
+        return pd.DataFrame(columns=columns)
+    
+    keys = ['G', 'min_l']
+    gl_merged = gh_data.groupby(keys, sort=False).agg(total_count=('count', 'sum'))
+    h_values = gh_data.sort_values('H', kind='stable').groupby(keys, sort=False)['H'].agg(' | '.join)
+    
+    sources = gh_sources.merge(gh_data[['G', 'H', 'min_l']], on=['G', 'H'])
+    sources = sources.drop_duplicates(keys + ['source']).sort_values('source', kind='stable')
+    source_sheets = sources.groupby(keys, sort=False)['source'].agg(', '.join)
+    
+    gl_merged['H'] = h_values.reindex(gl_merged.index)
+    gl_merged['来源工作表'] = source_sheets.reindex(gl_merged.index)
+    gl_merged = gl_merged.reset_index().rename(columns={'min_l': '最小L值', 'total_count': '出现次数'})
+    return gl_merged[columns]
+
+class ScanCache:
+    """工作表部分聚合结果的磁盘缓存
+
+    以 (工作簿绝对路径, 工作表部件, 压缩包目录中的 CRC32 和解压大小) 为键，
+    未修改的工作表直接读取缓存，只重新扫描有改动的工作表。
+    缓存总大小超过上限时按最近使用时间 (LRU) 淘汰。
+    """
+    VERSION = 3
+    
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, file_path, sheet_file, info):
+        key = f"{self.VERSION}|{os.path.abspath(file_path)}|{sheet_file}|{info['crc']:08x}|{info['file_size']}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+    
+    def get(self, file_path, sheet_file, info):
+        """读取缓存的 (partial, found_non_zero)，未命中返回 None"""
+        path = self._path(file_path, sheet_file, info)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)  # 刷新最近使用时间
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"缓存读取警告: {e}")
+            return None
+    
+    def put(self, file_path, sheet_file, info, entry):
+        path = self._path(file_path, sheet_file, info)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"缓存写入警告: {e}")
+    
+    def evict(self):
+        """按最近使用时间淘汰缓存，直到总大小不超过上限"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # 已被其他进程淘汰
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
             try:
-                return shared_strings[int(v_node.text)]
-            except (ValueError, IndexError):
-                return ''
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+def _scan_sheet_task(sheet_file):
+    return scan_sheet(worker_zip(), sheet_file)
+
+def scan_workbook(file_path, workers=1, cache=None, progress=True):
+    """扫描单个工作簿，返回按工作簿顺序排列的各表部分聚合结果
     
-    v_node = cell.find('.//ns:v', ns)
-    return v_node.text if v_node is not None else ''
+    返回 {'partials', 'sheet_names', 'found_non_zero'}；cache 为 ScanCache 实例时复用未修改工作表的缓存结果，
+    progress 为 False 时不显示进度（批量模式下由文件级进度代替）。
+    """
+    with zipfile.ZipFile(file_path) as z:
+        index = build_workbook_index(z)
+        sheet_files = get_sheet_files(z, index)
+        
+        # 各工作表的 (partial, found_non_zero)，优先从缓存读取
+        sheet_partials = {}
+        if cache is not None:
+            for sheet_file in sheet_files:
+                entry = cache.get(file_path, sheet_file, index[sheet_file])
+                if entry is not None:
+                    sheet_partials[sheet_file] = entry
+            if sheet_partials and progress:
+                print(f"缓存命中: {len(sheet_partials)}/{len(sheet_files)} 个工作表")
+        to_scan = [sheet_file for sheet_file in sheet_files if sheet_file not in sheet_partials]
+        profiling.count('sheets_cached', len(sheet_partials))
+        profiling.count('sheets_scanned', len(to_scan))
+        
+        pool = None
+        if workers > 1 and len(to_scan) > 1:
+            # 多进程模式：各工作表独立扫描，结果按工作表顺序合并，与单进程结果一致
+            pool = sheet_pool(file_path, min(workers, len(to_scan)))
+            futures = submit_largest_first(pool, index, to_scan, _scan_sheet_task)
+            results = (futures[sheet_file].result() for sheet_file in to_scan)
+        else:
+            results = (scan_sheet(z, sheet_file) for sheet_file in to_scan)
+        
+        try:
+            sheet_results = {}
+            for sheet_file, result in tqdm(zip(to_scan, results), total=len(to_scan),
+                                           desc="处理工作表中", disable=not progress):
+                if result['error']:
+                    print(f"处理工作表 {sheet_file} 时出错: {result['error']}")
+                sheet_results[sheet_file] = result
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        # 只加载扫描中实际引用到的共享字符串
+        with profiling.stage('shared_strings'):
+            shared_strings = SharedStrings.load(z, collect_shared_refs(sheet_results.values()))
+            for sheet_file, result in sheet_results.items():
+                entry = resolve_sheet_partial(result, shared_strings)
+                sheet_partials[sheet_file] = entry
+                if cache is not None and not result['error']:
+                    cache.put(file_path, sheet_file, index[sheet_file], entry)
+        
+        return {
+            'partials': [sheet_partials[sheet_file][0] for sheet_file in sheet_files],
+            'sheet_names': [index[sheet_file]['name'] for sheet_file in sheet_files],
+            'found_non_zero': any(sheet_partials[sheet_file][1] for sheet_file in sheet_files)
+        }
 
-def deep_scan_excel(file_path):
+def write_result(df, output_file, fmt=None):
+    """打印数据验证信息并保存结果表，格式由 fmt 或扩展名决定 (xlsx/csv/parquet)"""
+    print("\n=== 数据验证 ===")
+    print(f"总合并记录数: {len(df)}")
+    print("前5行示例:")
+    print(df.head())
+    
+    empty_gh = df[(df['G'] == '') | (df['H'] == '')]
+    if not empty_gh.empty:
+        print(f"\n警告: 发现 {len(empty_gh)} 条记录G/H列为空")
+    
+    write_frame(df, output_file, fmt)
+    print(f"\n▶ 结果已保存到 {output_file} 文件！")
+
+def result_file_for(file_path, fmt='xlsx'):
+    """生成输出文件名（基于输入文件名）"""
+    return f"{os.path.splitext(file_path)[0]}-结果.{fmt}"
+
+def update_index(index_path, entries):
+    """将各工作簿的聚合结果 (file_path, gh_data, gh_sources) 写入索引，替换同一工作簿的旧记录并重建合并表"""
+    with profiling.stage('update_index', index=index_path), GLIndex(index_path) as index:
+        for file_path, gh_data, gh_sources in entries:
+            index.add_workbook(file_path, gh_data, gh_sources)
+        gh_count, gl_count = index.rebuild()
+    print(f"▶ 索引已更新: {index_path} ({gh_count} 个 G-H 组合, {gl_count} 条 G/最小L值 记录)")
+
+def deep_scan_excel(file_path, workers=1, cache=None, fmt='xlsx', index_path=None):
+    """扫描工作簿，cache 为 ScanCache 实例时复用未修改工作表的缓存结果，fmt 为结果文件格式
+    
+    index_path 不为 None 时同时把 gh_data 和最小L值来源写入该 SQLite 索引，供 gl_index.py 查询。
+    扫描完成（包括未找到非零值）时返回 True，出错时打印错误并返回 False。
+    """
     print(">>> 启动Excel扫描引擎 (G和最小L值合并版) <<<")
     
     try:
-        with zipfile.ZipFile(file_path) as z:
-            # 获取共享字符串
-            shared_strings = []
-            try:
-                with z.open('xl/sharedStrings.xml') as f:
-                    sst = ET.parse(f).getroot()
-                    ns_sst = {'ns': sst.tag.split('}')[0].strip('{')} if '}' in sst.tag else {'ns': ''}
-                    shared_strings = [t.text if t.text else '' for t in sst.findall('.//ns:t', ns_sst)]
-            except Exception as e:
-                print(f"共享字符串读取警告: {e}")
-            
-            # 使用更高效的数据结构
-            gh_data = defaultdict(lambda: {
-                'min_l': float('inf'),
-                'count': 0,
-                'source_sheets': set()
-            })
-            
-            # 添加非零值检测标志
-            found_non_zero = False
-            
-            # 单次扫描处理
-            for sheet_file in tqdm(get_sheet_files(z), desc="处理工作表中"):
-                try:
-                    sheet_num = parse_sheet_number(sheet_file)
-                    sheet_name = get_sheet_name(z, sheet_num)
-                    
-                    with z.open(sheet_file) as f:
-                        root = ET.parse(f).getroot()
-                        ns = {'ns': root.tag.split('}')[0].strip('{')} if '}' in root.tag else {'ns': ''}
-                        
-                        cells = {}
-                        row_numbers = set()
-                        for cell in root.findall('.//ns:c', ns):
-                            if (ref := cell.get('r')):
-                                col = re.sub(r'\d+', '', ref).upper()
-                                row = re.sub(r'[A-Za-z]+', '', ref)
-                                cells[(col, row)] = cell
-                                row_numbers.add(int(row))
-                        
-                        if not row_numbers:
-                            continue
-                            
-                        min_row = min(row_numbers)
-                        process_rows = [str(r) for r in row_numbers if r > min_row]
-                        
-                        # 记录本工作表已处理的G-H组合（用于去重）
-                        sheet_processed_gh = set()
-                        
-                        for row in process_rows:
-                            q_cell = cells.get(('Q', row))
-                            if q_cell is None:
-                                continue
-                                
-                            q_val = get_cell_value(q_cell, shared_strings, ns)
-                            if q_val and q_val not in ('0', '0.0'):
-                                found_non_zero = True  # 标记找到非零值
-                                g_val = get_cell_value(cells.get(('G', row)), shared_strings, ns)
-                                h_val = get_cell_value(cells.get(('H', row)), shared_strings, ns)
-                                l_val = get_cell_value(cells.get(('L', row)), shared_strings, ns)
-                                
-                                try:
-                                    l_num = float(l_val) if l_val else float('inf')
-                                    gh_key = (g_val, h_val)
-                                    
-                                    # 更新最小L值和来源
-                                    if l_num < gh_data[gh_key]['min_l']:
-                                        gh_data[gh_key]['min_l'] = l_num
-                                        gh_data[gh_key]['source_sheets'] = {sheet_name}
-                                    elif l_num == gh_data[gh_key]['min_l']:
-                                        gh_data[gh_key]['source_sheets'].add(sheet_name)
-                                    
-                                    # 同一工作表内相同G-H组合只计一次
-                                    if gh_key not in sheet_processed_gh:
-                                        gh_data[gh_key]['count'] += 1
-                                        sheet_processed_gh.add(gh_key)
-                                except ValueError:
-                                    continue
-                
-                except Exception as e:
-                    print(f"处理工作表 {sheet_file} 时出错: {e}")
-            
-            # 检查是否找到非零值
-            if not found_non_zero:
-                print("\n▶ 未在任何工作表中找到Q列非零值")
-                return
-            
-            # 第二阶段：合并相同G和最小L值的记录
-            gl_merged = defaultdict(lambda: {
-                'h_values': set(),
-                'total_count': 0,
-                'source_sheets': set()
-            })
-            
-            for (g_val, h_val), data in gh_data.items():
-                if data['min_l'] == float('inf'):
-                    continue
-                    
-                gl_key = (g_val, data['min_l'])
-                gl_merged[gl_key]['h_values'].add(h_val)
-                gl_merged[gl_key]['total_count'] += data['count']
-                gl_merged[gl_key]['source_sheets'].update(data['source_sheets'])
-            
-            # 生成最终结果
-            output_data = []
-            for (g_val, min_l), data in gl_merged.items():
-                output_data.append({
-                    'G': g_val,
-                    'H': ' | '.join(sorted(data['h_values'])),
-                    '最小L值': min_l,
-                    '出现次数': data['total_count'],
-                    '来源工作表': ', '.join(sorted(data['source_sheets']))
-                })
-
-            # 生成输出文件名（基于输入文件名）
-            base_name = os.path.splitext(file)[0]  # 去掉扩展名
-            output_file = f"{base_name}-结果.xlsx"
+        with profiling.stage('scan_workbook', file=file_path):
+            scan = scan_workbook(file_path, workers, cache)
+        if cache is not None:
+            cache.evict()
         
-            # 输出结果
-            if output_data:
-                df = pd.DataFrame(output_data)
-                df = df[['G', 'H', '最小L值', '出现次数', '来源工作表']]
-            
-                print("\n=== 数据验证 ===")
-                print(f"总合并记录数: {len(df)}")
-                print("前5行示例:")
-                print(df.head())
-            
-                empty_gh = df[(df['G'] == '') | (df['H'] == '')]
-                if not empty_gh.empty:
-                    print(f"\n警告: 发现 {len(empty_gh)} 条记录G/H列为空")
-            
-                df.to_excel(output_file, index=False, engine='openpyxl')
-                print(f"\n▶ 结果已保存到 {output_file} 文件！")
+        # 检查是否找到非零值
+        if not scan['found_non_zero']:
+            print("\n▶ 未在任何工作表中找到Q列非零值")
+            if index_path:
+                # 仍写入空结果，替换该工作簿在索引中的旧记录
+                update_index(index_path, [(file_path, *aggregate_partials([], []))])
+            return True
         
+        # 按工作簿顺序向量化合并各表结果
+        with profiling.stage('aggregate'):
+            gh_data, gh_sources = aggregate_partials(scan['partials'], scan['sheet_names'])
+            profiling.count('gh_groups', len(gh_data))
+        
+        # 第二阶段：合并相同G和最小L值的记录
+        with profiling.stage('merge_gl'):
+            gl_merged = merge_gl(gh_data, gh_sources)
+            profiling.count('gl_groups', len(gl_merged))
+        
+        # 输出结果
+        if not gl_merged.empty:
+            write_result(gl_merged, result_file_for(file_path, fmt), fmt)
+        if index_path:
+            update_index(index_path, [(file_path, gh_data, gh_sources)])
+        return True
+    
     except Exception as e:
         print(f"!!! 扫描失败: {e}")
+        return False
+
+def _scan_workbook_task(file_path, cache):
+    """批量模式的工作进程任务：单进程扫描一个工作簿，失败时返回错误信息"""
+    try:
+        with profiling.stage('scan_workbook', file=file_path):
+            return scan_workbook(file_path, cache=cache, progress=False), None
+    except Exception as e:
+        return None, str(e)
+
+def expand_inputs(path):
+    """将文件、目录或通配符展开为工作簿列表（跳过本工具生成的结果文件和 Excel 临时文件）"""
+    if os.path.isdir(path):
+        candidates = glob.glob(os.path.join(path, '*.xlsx'))
+    else:
+        candidates = glob.glob(path)
+    return sorted(
+        p for p in candidates
+        if os.path.isfile(p)
+        and not os.path.basename(p).startswith('~$')
+        and not os.path.splitext(p)[0].endswith('-结果')
+    )
+
+def batch_scan_excel(file_paths, output_file, workers=1, cache=None, per_file=False, fmt=None, index_path=None):
+    """批量扫描多个工作簿并跨文件合并为一份 G/最小L值 报告
+    
+    各工作簿在进程池中并发扫描，同时运行的工作簿数不超过 workers，单个工作簿按流式解析，
+    内存占用有上限；来源列显示为 "文件名:工作表"。per_file 为 True 时同时输出每个文件各自的结果。
+    fmt 为结果文件格式，默认按 output_file 的扩展名判断。
+    index_path 不为 None 时把每个文件各自的聚合结果写入该 SQLite 索引，出错的文件保留索引中的旧记录。
+    """
+    print(f">>> 启动Excel批量扫描引擎: {len(file_paths)} 个文件 <<<")
+    
+    partials = []
+    source_names = []
+    found_non_zero = False
+    index_entries = []
+    per_file_fmt = detect_format(output_file, fmt)
+    
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(file_paths))),
+                             initializer=profiling.configure, initargs=(profiling.get_config(),)) as pool:
+        results = pool.map(_scan_workbook_task, file_paths, [cache] * len(file_paths))
+        for file_path, (scan, error) in tqdm(zip(file_paths, results), total=len(file_paths),
+                                             desc="处理文件中"):
+            if error:
+                print(f"\n处理文件 {file_path} 时出错: {error}")
+                continue
+            
+            file_name = os.path.basename(file_path)
+            partials.extend(scan['partials'])
+            source_names.extend(f"{file_name}:{sheet_name}" for sheet_name in scan['sheet_names'])
+            found_non_zero = found_non_zero or scan['found_non_zero']
+            
+            if (per_file and scan['found_non_zero']) or index_path:
+                file_gh = aggregate_partials(scan['partials'], scan['sheet_names'])
+                if index_path:
+                    index_entries.append((file_path, *file_gh))
+            if per_file and scan['found_non_zero']:
+                file_result = merge_gl(*file_gh)
+                if not file_result.empty:
+                    write_frame(file_result, result_file_for(file_path, per_file_fmt), per_file_fmt)
+    
+    if cache is not None:
+        cache.evict()
+    if index_path:
+        update_index(index_path, index_entries)
+    
+    if not found_non_zero:
+        print("\n▶ 未在任何工作表中找到Q列非零值")
+        return
+    
+    with profiling.stage('aggregate'):
+        gh_data, gh_sources = aggregate_partials(partials, source_names)
+        profiling.count('gh_groups', len(gh_data))
+    with profiling.stage('merge_gl'):
+        gl_merged = merge_gl(gh_data, gh_sources)
+        profiling.count('gl_groups', len(gl_merged))
+    if not gl_merged.empty:
+        write_result(gl_merged, output_file, fmt)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使用方法: python report.py 文件名.xlsx")
-        sys.exit(1)
-    
-    file = sys.argv[1]
-    if not os.path.exists(file):
-        print(f"文件不存在: {file}")
-        sys.exit(1)
-    deep_scan_excel(file)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Excel G和最小L值扫描工具")
+    parser.add_argument("path", help="要扫描的Excel文件；传入目录或通配符（如 \"data/*.xlsx\"）时进入批量模式")
+    parser.add_argument("--workers", type=int, default=1, help="并行扫描的进程数，批量模式下为同时扫描的文件数 (默认: 1)")
+    parser.add_argument("--output", help="批量模式的合并结果文件 (默认: 输入目录下的 批量扫描-结果.xlsx)")
+    parser.add_argument("--per-file", action="store_true", help="批量模式下同时输出每个文件各自的结果")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())),
+                        help="结果文件格式 (默认: 按 --output 扩展名判断，否则为 xlsx)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用扫描缓存，重新扫描所有工作表")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"扫描缓存目录 (默认: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_MB, help=f"扫描缓存大小上限MB (默认: {DEFAULT_CACHE_MB})")
+    parser.add_argument("--index", metavar="PATH",
+                        help="同时把聚合结果写入 SQLite 索引 PATH（已存在时更新同一工作簿的记录），用 gl_index.py 查询")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    
+    cache = None if args.no_cache else ScanCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    
+    with profiling.session(args.profile, 'check', args.profile_stage):
+        if os.path.isfile(args.path):
+            deep_scan_excel(args.path, workers=args.workers, cache=cache, fmt=args.format or 'xlsx',
+                            index_path=args.index)
+        else:
+            files = expand_inputs(args.path)
+            if not files:
+                print(f"未找到Excel文件: {args.path}")
+                sys.exit(1)
+            output_file = args.output or os.path.join(os.path.dirname(files[0]), f"批量扫描-结果.{args.format or 'xlsx'}")
+            batch_scan_excel(files, output_file, workers=args.workers, cache=cache,
+                             per_file=args.per_file, fmt=args.format, index_path=args.index)
\ No newline at end of file
@@ -1,8 +1,15 @@
+import json
+import numpy as np
 import pandas as pd
 import sys
 import os
 import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import profiling
+from writers import FORMATS
+from xlsx_reader import SharedStrings, build_workbook_index, get_cell_token, iter_sheet_rows, resolve_token
 
 warnings.filterwarnings("ignore")
 
@@ -33,8 +40,449 @@ def safe_compare(df1, df2):
         else:
             return df1[diff_rows].compare(df2[diff_rows])
 
-def compare_excel(file1, file2, ignore_columns=None, sheet1_name=None, sheet2_name=None):
-    """支持不同Sheet名比较"""
+def _key_text(value):
+    """键值统一转为文本，避免 1 与 1.0 因读取类型不同而匹配不上"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _match_keys(keys1, keys2):
+    """按键哈希连接两表，返回 (matched1, matched2, removed, added) 行号数组
+    
+    重复键按出现顺序一一配对（第 n 次出现对应第 n 次出现）；哈希相同但键不同的行视为不匹配。
+    """
+    frames = []
+    for keys in (keys1, keys2):
+        key_hash = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        frames.append(pd.DataFrame({
+            'hash': key_hash,
+            'occurrence': pd.Series(key_hash).groupby(key_hash).cumcount().to_numpy(),
+            'row': np.arange(len(keys))
+        }))
+    joined = frames[0].merge(frames[1], on=['hash', 'occurrence'], how='outer', suffixes=('1', '2'))
+    
+    both = joined['row1'].notna() & joined['row2'].notna()
+    matched1 = joined.loc[both, 'row1'].to_numpy(np.int64)
+    matched2 = joined.loc[both, 'row2'].to_numpy(np.int64)
+    
+    # 排除哈希碰撞
+    same_key = (keys1.to_numpy()[matched1] == keys2.to_numpy()[matched2]).all(axis=1)
+    removed = np.sort(np.concatenate([joined.loc[joined['row2'].isna(), 'row1'].to_numpy(np.int64),
+                                      matched1[~same_key]]))
+    added = np.sort(np.concatenate([joined.loc[joined['row1'].isna(), 'row2'].to_numpy(np.int64),
+                                    matched2[~same_key]]))
+    return matched1[same_key], matched2[same_key], removed, added
+
+def keyed_compare(df1, df2, key_columns):
+    """按键列匹配行的比较，返回 {'added', 'removed', 'changed'}
+    
+    两表按键列哈希连接，插入或删除行不影响其他行的匹配；匹配行先比较整行内容哈希，
+    只有哈希不同的行才逐单元格比较。运行时间与行数成线性关系。
+    added / removed 为文件2新增、文件1独有的行，changed 为逐单元格差异
+    （键列、列名、文件1值、文件2值），内容哈希不同但值相等的行（如 1 与 1.0）不计入。
+    """
+    df1 = df1.reset_index(drop=True)
+    df2 = df2.reset_index(drop=True)
+    df1.columns = df1.columns.str.strip()
+    df2.columns = df2.columns.str.strip()
+    df2 = df2[df1.columns]
+    
+    keys1 = pd.DataFrame({col: df1[col].map(_key_text) for col in key_columns})
+    keys2 = pd.DataFrame({col: df2[col].map(_key_text) for col in key_columns})
+    rows1, rows2, removed, added = _match_keys(keys1, keys2)
+    
+    # 先按整行内容哈希筛出有变化的行
+    value_columns = [col for col in df1.columns if col not in key_columns]
+    changed = []
+    if value_columns and len(rows1):
+        hash1 = pd.util.hash_pandas_object(df1[value_columns], index=False).to_numpy()[rows1]
+        hash2 = pd.util.hash_pandas_object(df2[value_columns], index=False).to_numpy()[rows2]
+        differs = hash1 != hash2
+        rows1, rows2 = rows1[differs], rows2[differs]
+        
+        for col in value_columns:
+            values1 = df1[col].to_numpy()[rows1]
+            values2 = df2[col].to_numpy()[rows2]
+            cell_diff = values1 != values2
+            if cell_diff.any():
+                cells = keys1.iloc[rows1[cell_diff]].reset_index(drop=True)
+                cells['列'] = col
+                cells['文件1'] = values1[cell_diff]
+                cells['文件2'] = values2[cell_diff]
+                changed.append(cells)
+    
+    changed = (pd.concat(changed, ignore_index=True) if changed
+               else pd.DataFrame(columns=list(key_columns) + ['列', '文件1', '文件2']))
+    return {
+        'added': df2.iloc[added].reset_index(drop=True),
+        'removed': df1.iloc[removed].reset_index(drop=True),
+        'changed': changed
+    }
+
+def report_keyed_diff(result, limit=20):
+    """打印按键比较结果，每类最多显示 limit 行，无差异时返回 True"""
+    labels = {'added': '新增行 (仅文件2)', 'removed': '删除行 (仅文件1)', 'changed': '变更单元格'}
+    if all(result[kind].empty for kind in labels):
+        print("\n✅ 内容完全相同")
+        return True
+    
+    print("\n❌ 发现差异:")
+    for kind, label in labels.items():
+        frame = result[kind]
+        print(f"\n- {label}: {len(frame)}")
+        if not frame.empty:
+            print(frame.head(limit).to_string(index=False))
+    return False
+
+# 流式比较每个分块包含的行数
+DEFAULT_CHUNK_ROWS = 10000
+
+def _find_sheet_part(index, sheet_name=None):
+    """按工作表名查找工作表部件，未指定时取第一个工作表"""
+    for part, info in index.items():
+        if sheet_name is None or info['name'] == sheet_name:
+            return part
+    raise ValueError(f"找不到工作表 '{sheet_name}' (可选: {[info['name'] for info in index.values()]})")
+
+def _part_signature(zip_ref, part):
+    """压缩包内部件的 (CRC, 大小)，部件不存在时返回 None"""
+    try:
+        info = zip_ref.getinfo(part)
+    except KeyError:
+        return None
+    return info.CRC, info.file_size
+
+def _cell_fingerprint_value(cell, shared_strings, ns):
+    """单元格的比较值：数值按 float 比较（1 与 1.0 相同），其他按文本比较"""
+    value = resolve_token(get_cell_token(cell, ns), shared_strings)
+    if cell.get('t') in (None, 'n') and value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return value
+
+def iter_row_chunks(zip_ref, sheet_part, shared_strings, ignore_columns=(), chunk_rows=DEFAULT_CHUNK_ROWS):
+    """流式读取工作表，按行号分块产出 (块序号, {行号: 行指纹})
+    
+    行指纹为该行非空单元格 (列字母, 值) 的哈希，没有非空单元格的行不产出；第一个含单元格的行为表头，
+    表头中名称在 ignore_columns 内的列不参与比较。每次只在内存中保留一个分块。
+    """
+    ignore_columns = {str(col).strip() for col in ignore_columns}
+    skip = None
+    chunk_index = None
+    rows = {}
+    with zip_ref.open(sheet_part) as f:
+        for row, cells, ns in iter_sheet_rows(profiling.timed_stream(f), None):
+            values = {col: _cell_fingerprint_value(cell, shared_strings, ns) for col, cell in cells.items()}
+            if skip is None:
+                skip = {col for col, value in values.items() if str(value).strip() in ignore_columns}
+            
+            # 单元格全部为空或只有样式的行不记录，另一文件没有该行时不算差异
+            fields = tuple((col, value) for col, value in values.items() if value != '' and col not in skip)
+            if not fields:
+                continue
+            
+            index = (row - 1) // chunk_rows
+            if index != chunk_index:
+                if rows:
+                    yield chunk_index, rows
+                chunk_index, rows = index, {}
+            rows[row] = hash(fields)
+    if rows:
+        yield chunk_index, rows
+
+def _align_chunks(chunks1, chunks2):
+    """按块序号对齐两个分块流，某一方缺少的块视为空块"""
+    chunk1, chunk2 = next(chunks1, None), next(chunks2, None)
+    while chunk1 is not None or chunk2 is not None:
+        if chunk2 is None or (chunk1 is not None and chunk1[0] < chunk2[0]):
+            yield chunk1[1], {}
+            chunk1 = next(chunks1, None)
+        elif chunk1 is None or chunk2[0] < chunk1[0]:
+            yield {}, chunk2[1]
+            chunk2 = next(chunks2, None)
+        else:
+            yield chunk1[1], chunk2[1]
+            chunk1, chunk2 = next(chunks1, None), next(chunks2, None)
+
+def _merge_ranges(ranges, rows):
+    """将有差异的行号并入 (起始行, 结束行) 区间列表"""
+    for row in rows:
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+
+def stream_compare(file1, file2, sheet1_name=None, sheet2_name=None, ignore_columns=(),
+                   find_all=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """流式分块比较两个工作表，按单元格位置比较，返回结果字典
+    
+    先比较两个工作表部件和共享字符串表的 CRC 与大小，全部相同时不解析直接判定相同。
+    否则两表同步按行号分块读取，逐块比较块指纹；find_all 为 False 时遇到第一个不同的块即停止，
+    为 True 时继续扫描完整个工作表，在内存中只保留当前块和差异区间。
+    返回 {'identical', 'precheck', 'sheets', 'chunks', 'ranges'}，ranges 为差异行号区间（含两端）。
+    """
+    with zipfile.ZipFile(file1) as z1, zipfile.ZipFile(file2) as z2, profiling.stage('stream_compare'):
+        index1, index2 = build_workbook_index(z1), build_workbook_index(z2)
+        part1 = _find_sheet_part(index1, sheet1_name)
+        part2 = _find_sheet_part(index2, sheet2_name)
+        sheets = (index1[part1]['name'], index2[part2]['name'])
+        result = {'identical': True, 'precheck': False, 'sheets': sheets, 'chunks': 0, 'ranges': []}
+        
+        # 快速预检：工作表部件与共享字符串表完全相同则内容必然相同
+        sst = 'xl/sharedStrings.xml'
+        if (_part_signature(z1, part1) == _part_signature(z2, part2)
+                and _part_signature(z1, sst) == _part_signature(z2, sst)):
+            result['precheck'] = True
+            profiling.count('precheck_hits')
+            return result
+        
+        chunks = _align_chunks(
+            iter_row_chunks(z1, part1, SharedStrings.load(z1), ignore_columns, chunk_rows),
+            iter_row_chunks(z2, part2, SharedStrings.load(z2), ignore_columns, chunk_rows)
+        )
+        for rows1, rows2 in chunks:
+            result['chunks'] += 1
+            profiling.count('chunks_compared')
+            if hash(tuple(rows1.items())) == hash(tuple(rows2.items())):
+                continue
+            
+            result['identical'] = False
+            diff_rows = sorted(row for row in rows1.keys() | rows2.keys() if rows1.get(row) != rows2.get(row))
+            _merge_ranges(result['ranges'], diff_rows)
+            if not find_all:
+                break
+    return result
+
+def stream_compare_excel(file1, file2, ignore_columns=None, sheet1_name=None, sheet2_name=None,
+                         find_all=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """流式比较模式的入口，打印结果；相同时返回 True，有差异返回 False，文件或工作表无法读取时返回 None"""
+    print(f"🔍 文件验证:\n- 文件1: {Path(file1).resolve()}\n- 文件2: {Path(file2).resolve()}")
+    try:
+        result = stream_compare(file1, file2, sheet1_name, sheet2_name, ignore_columns or (),
+                                find_all, chunk_rows)
+    except Exception as e:
+        print(f"\n❌ 错误: {str(e)}")
+        return None
+    
+    print(f"\n📌 比较配置 (流式, 每块 {chunk_rows} 行): '{result['sheets'][0]}' ↔ '{result['sheets'][1]}'")
+    if result['precheck']:
+        print("\n✅ 内容完全相同 (工作表部件 CRC 和大小一致，未解析)")
+        return True
+    if result['identical']:
+        print(f"\n✅ 内容完全相同 (比较了 {result['chunks']} 个分块)")
+        return True
+    
+    ranges = ', '.join(f"{start}-{end}" if start != end else f"{start}" for start, end in result['ranges'])
+    if find_all:
+        print(f"\n❌ 发现差异: {len(result['ranges'])} 个行区间")
+    else:
+        print(f"\n❌ 发现差异 (在第 {result['chunks']} 个分块处停止)")
+    print(f"差异行: {ranges}")
+    return False
+
+# 回归比较的退出码
+EXIT_IDENTICAL, EXIT_DIFFERENT, EXIT_ERROR = 0, 1, 2
+
+def exit_code_for(success):
+    """单表比较结果对应的退出码：True 相同，False 有差异，None 出错"""
+    if success is None:
+        return EXIT_ERROR
+    return EXIT_IDENTICAL if success else EXIT_DIFFERENT
+
+def read_all_sheets(path):
+    """读取文件中的所有工作表，csv / parquet 视为以文件名主干命名的单个工作表"""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    stem = Path(path).stem
+    if fmt == 'csv':
+        return {stem: pd.read_csv(path, encoding='utf-8-sig')}
+    if fmt == 'parquet':
+        return {stem: pd.read_parquet(path)}
+    return pd.read_excel(path, sheet_name=None)
+
+def diff_frames(df1, df2, atol=0.0, rtol=0.0, ignore_columns=()):
+    """按位置逐单元格比较两个表，返回差异信息
+    
+    两边都是数值的列按 |a - b| <= atol + rtol * |b| 向量化判断，NaN 与 NaN 视为相同；
+    其他列空值按空字符串比较。返回 {'rows', 'columns_only1', 'columns_only2', 'cells'}，
+    cells 为差异单元格长表（行号按 Excel 计，表头为第 1 行）。
+    """
+    df1 = df1.reset_index(drop=True)
+    df2 = df2.reset_index(drop=True)
+    df1.columns = [str(col).strip() for col in df1.columns]
+    df2.columns = [str(col).strip() for col in df2.columns]
+    ignore = {str(col).strip() for col in ignore_columns}
+    common = [col for col in df1.columns if col in df2.columns and col not in ignore]
+    rows = min(len(df1), len(df2))
+    
+    cells = []
+    for col in common:
+        a = df1[col].iloc[:rows]
+        b = df2[col].iloc[:rows]
+        if (pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b)
+                and not pd.api.types.is_bool_dtype(a) and not pd.api.types.is_bool_dtype(b)):
+            x = a.to_numpy(np.float64, na_value=np.nan)
+            y = b.to_numpy(np.float64, na_value=np.nan)
+            with np.errstate(invalid='ignore'):
+                equal = (x == y) | (np.isnan(x) & np.isnan(y)) | (np.abs(x - y) <= atol + rtol * np.abs(y))
+        else:
+            equal = a.fillna('').to_numpy(object) == b.fillna('').to_numpy(object)
+        
+        bad = np.flatnonzero(~equal)
+        if len(bad):
+            cells.append(pd.DataFrame({
+                '行': bad + 2,
+                '列': col,
+                '文件1': a.to_numpy(object)[bad],
+                '文件2': b.to_numpy(object)[bad]
+            }))
+    
+    return {
+        'rows': (len(df1), len(df2)),
+        'columns_only1': [col for col in df1.columns if col not in df2.columns and col not in ignore],
+        'columns_only2': [col for col in df2.columns if col not in df1.columns and col not in ignore],
+        'cells': (pd.concat(cells, ignore_index=True) if cells
+                  else pd.DataFrame(columns=['行', '列', '文件1', '文件2']))
+    }
+
+def _json_records(df):
+    """DataFrame 转为可写入 JSON 的记录列表，NaN 转为 None"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def _workbook_precheck(file1, file2):
+    """两个 xlsx 的工作表顺序、名称、各工作表部件和共享字符串表的 CRC 与大小全部一致时返回 True"""
+    if not (zipfile.is_zipfile(file1) and zipfile.is_zipfile(file2)):
+        return False
+    with zipfile.ZipFile(file1) as z1, zipfile.ZipFile(file2) as z2:
+        index1, index2 = build_workbook_index(z1), build_workbook_index(z2)
+        if [info['name'] for info in index1.values()] != [info['name'] for info in index2.values()]:
+            return False
+        sst = 'xl/sharedStrings.xml'
+        return (_part_signature(z1, sst) == _part_signature(z2, sst)
+                and all(_part_signature(z1, p1) == _part_signature(z2, p2) for p1, p2 in zip(index1, index2)))
+
+def compare_workbooks(file1, file2, ignore_columns=(), atol=0.0, rtol=0.0, max_samples=20):
+    """比较两个文件的所有工作表（按名称配对），返回可序列化为 JSON 的结果
+    
+    status 为 identical / different / error；每个工作表的 status 为 identical / different /
+    only_in_file1 / only_in_file2，samples 列出前 max_samples 个差异单元格。
+    """
+    result = {'file1': str(file1), 'file2': str(file2), 'status': 'identical',
+              'precheck': False, 'sheets': [], 'error': None}
+    try:
+        if _workbook_precheck(file1, file2):
+            result['precheck'] = True
+            profiling.count('precheck_hits')
+            return result
+        
+        with profiling.stage('read_sheets', file=str(file1)):
+            sheets1 = read_all_sheets(file1)
+            sheets2 = read_all_sheets(file2)
+        for name in list(sheets1) + [name for name in sheets2 if name not in sheets1]:
+            entry = {'sheet': name}
+            if name not in sheets2:
+                entry['status'] = 'only_in_file1'
+            elif name not in sheets1:
+                entry['status'] = 'only_in_file2'
+            else:
+                with profiling.stage('diff_frames', sheet=name):
+                    diff = diff_frames(sheets1[name], sheets2[name], atol, rtol, ignore_columns)
+                    profiling.count('rows_compared', min(diff['rows']))
+                    profiling.count('diff_cells', len(diff['cells']))
+                cells = diff['cells']
+                different = (len(cells) or diff['columns_only1'] or diff['columns_only2']
+                             or diff['rows'][0] != diff['rows'][1])
+                entry.update(
+                    status='different' if different else 'identical',
+                    rows=list(diff['rows']),
+                    columns_only1=diff['columns_only1'],
+                    columns_only2=diff['columns_only2'],
+                    diff_cells=len(cells),
+                    samples=_json_records(cells.head(max_samples))
+                )
+            result['sheets'].append(entry)
+        
+        if any(entry['status'] != 'identical' for entry in result['sheets']):
+            result['status'] = 'different'
+    except Exception as e:
+        result.update(status='error', error=str(e))
+    return result
+
+def _compare_pair_task(args):
+    """目录模式的工作进程任务"""
+    file1, file2, options = args
+    return compare_workbooks(file1, file2, **options)
+
+def _list_result_files(directory):
+    """目录下可比较的结果文件（相对路径），跳过 Excel 临时文件"""
+    return {
+        os.path.relpath(path, directory)
+        for path in Path(directory).rglob('*')
+        if path.is_file() and path.suffix.lower() in FORMATS and not path.name.startswith('~$')
+    }
+
+def compare_directories(dir1, dir2, workers=1, **options):
+    """按相对路径配对两个目录中的文件，在进程池中逐对比较所有工作表，返回各文件的结果列表"""
+    files1 = _list_result_files(dir1)
+    files2 = _list_result_files(dir2)
+    pairs = sorted(files1 & files2)
+    tasks = [(os.path.join(dir1, name), os.path.join(dir2, name), options) for name in pairs]
+    
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=profiling.configure, initargs=(profiling.get_config(),)) as pool:
+            results = list(pool.map(_compare_pair_task, tasks))
+    else:
+        results = [_compare_pair_task(task) for task in tasks]
+    
+    for name in sorted(files1 - files2):
+        results.append({'file1': os.path.join(dir1, name), 'file2': None, 'status': 'only_in_dir1'})
+    for name in sorted(files2 - files1):
+        results.append({'file1': None, 'file2': os.path.join(dir2, name), 'status': 'only_in_dir2'})
+    return results
+
+def summarize_results(results, atol=0.0, rtol=0.0):
+    """汇总各文件的比较结果，返回 (JSON 摘要, 退出码)"""
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    
+    if counts.get('error'):
+        exit_code = EXIT_ERROR
+    elif any(status != 'identical' for status in counts):
+        exit_code = EXIT_DIFFERENT
+    else:
+        exit_code = EXIT_IDENTICAL
+    summary = {
+        'identical': exit_code == EXIT_IDENTICAL,
+        'tolerance': {'atol': atol, 'rtol': rtol},
+        'counts': counts,
+        'files': results
+    }
+    return summary, exit_code
+
+def print_results(results):
+    """逐文件打印回归比较结果"""
+    icons = {'identical': '✅', 'different': '❌', 'error': '⚠️'}
+    for result in results:
+        name = result['file1'] or result['file2']
+        print(f"{icons.get(result['status'], '❌')} {name}: {result['status']}")
+        if result.get('error'):
+            print(f"    错误: {result['error']}")
+        for entry in result.get('sheets', []):
+            if entry['status'] == 'identical':
+                continue
+            detail = f"    - {entry['sheet']}: {entry['status']}"
+            if entry['status'] == 'different':
+                detail += f" (行数 {entry['rows'][0]}/{entry['rows'][1]}, 差异单元格 {entry['diff_cells']})"
+            print(detail)
+
+def compare_excel(file1, file2, ignore_columns=None, sheet1_name=None, sheet2_name=None, key_columns=None):
+    """支持不同Sheet名比较，指定 key_columns 时按键列匹配行
+    
+    相同时返回 True，有差异返回 False；文件、工作表或键列不存在等错误返回 None。
+    """
     if ignore_columns is None:
         ignore_columns = []
 
@@ -53,8 +501,10 @@ def compare_excel(file1, file2, ignore_columns=None, sheet1_name=None, sheet2_na
         print(f"- 文件1 Sheet: '{sheet1}' (可选: {sheets1})")
         print(f"- 文件2 Sheet: '{sheet2}' (可选: {sheets2})")
 
-        df1 = pd.read_excel(file1, sheet_name=sheet1).fillna("")
-        df2 = pd.read_excel(file2, sheet_name=sheet2).fillna("")
+        with profiling.stage('read_excel'):
+            df1 = pd.read_excel(file1, sheet_name=sheet1).fillna("")
+            df2 = pd.read_excel(file2, sheet_name=sheet2).fillna("")
+            profiling.count('rows_read', len(df1) + len(df2))
 
         print(f"\n🔎 列名对比:")
         print(f"- 文件1: {df1.columns.tolist()}")
@@ -69,9 +519,22 @@ def compare_excel(file1, file2, ignore_columns=None, sheet1_name=None, sheet2_na
 
         print([repr(c) for c in df1.columns])  # 显示列名的原始形式
         print(f"文件1 形状: {df1.shape}, 文件2 形状: {df2.shape}")
-
+        
+        if key_columns:
+            key_columns = [col.strip() for col in key_columns]
+            missing = [col for col in key_columns
+                       if col not in df1.columns.str.strip() or col not in df2.columns.str.strip()]
+            if missing:
+                print(f"\n❌ 错误: 键列不存在: {missing}")
+                return None
+            print(f"\n🔑 按键列匹配: {list(key_columns)}")
+            with profiling.stage('keyed_compare'):
+                keyed = keyed_compare(df1, df2, key_columns)
+            return report_keyed_diff(keyed)
+        
         # 使用安全比较
-        diff = safe_compare(df1, df2)
+        with profiling.stage('compare'):
+            diff = safe_compare(df1, df2)
         if diff.empty:
             print("\n✅ 内容完全相同")
             return True
@@ -82,23 +545,71 @@ def compare_excel(file1, file2, ignore_columns=None, sheet1_name=None, sheet2_na
 
     except Exception as e:
         print(f"\n❌ 错误: {str(e)}")
-        return False
+        return None
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Excel文件比较工具")
-    parser.add_argument("file1", help="第一个Excel文件")
-    parser.add_argument("file2", help="第二个Excel文件")
+    parser.add_argument("file1", help="第一个Excel文件（两个参数都是目录时按目录比较）")
+    parser.add_argument("file2", help="第二个Excel文件或目录")
     parser.add_argument("--ignore", nargs="+", default=[], help="要忽略的列名")
     parser.add_argument("--sheet1", help="指定文件1的sheet名")
     parser.add_argument("--sheet2", help="指定文件2的sheet名")
+    parser.add_argument("--key", nargs="+", help="按这些键列匹配行，结果分为新增/删除/变更")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式分块比较，只判断是否相同，遇到第一个差异即停止")
+    parser.add_argument("--all-ranges", action="store_true",
+                        help="流式比较整个工作表并列出所有差异行区间（内存占用有上限）")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f"流式比较每个分块的行数 (默认: {DEFAULT_CHUNK_ROWS})")
+    parser.add_argument("--all-sheets", action="store_true",
+                        help="按名称配对比较所有工作表（目录模式下始终如此）")
+    parser.add_argument("--atol", type=float, default=0.0, help="数值列允许的绝对误差 (默认: 0)")
+    parser.add_argument("--rtol", type=float, default=0.0, help="数值列允许的相对误差 (默认: 0)")
+    parser.add_argument("--workers", type=int, default=1, help="目录模式并行比较的进程数 (默认: 1)")
+    parser.add_argument("--json", metavar="PATH",
+                        help="所有工作表/目录模式下将 JSON 摘要写入文件，'-' 表示输出到标准输出")
+    profiling.add_arguments(parser)
     args = parser.parse_args()
-
-    success = compare_excel(
-        args.file1, args.file2,
-        ignore_columns=args.ignore,
-        sheet1_name=args.sheet1,
-        sheet2_name=args.sheet2
-    )
-    input("\n按回车键退出...")
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    if args.key and (args.stream or args.all_ranges):
+        parser.error("--key 不能与 --stream/--all-ranges 同时使用")
+    
+    with profiling.session(args.profile, 'compare_excel', args.profile_stage):
+        directory_mode = os.path.isdir(args.file1) and os.path.isdir(args.file2)
+        if directory_mode or args.all_sheets:
+            # 回归比较模式：不交互，结果以 JSON 摘要和退出码给出
+            options = {'ignore_columns': args.ignore, 'atol': args.atol, 'rtol': args.rtol}
+            if directory_mode:
+                results = compare_directories(args.file1, args.file2, workers=args.workers, **options)
+            else:
+                results = [compare_workbooks(args.file1, args.file2, **options)]
+            summary, exit_code = summarize_results(results, args.atol, args.rtol)
+        
+            if args.json == '-':
+                print(json.dumps(summary, ensure_ascii=False, indent=2, default=str))
+            else:
+                print_results(results)
+                if args.json:
+                    with open(args.json, 'w', encoding='utf-8') as f:
+                        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+                    print(f"\nJSON 摘要已保存到 {args.json}")
+            sys.exit(exit_code)
+    
+        if args.stream or args.all_ranges:
+            success = stream_compare_excel(
+                args.file1, args.file2,
+                ignore_columns=args.ignore,
+                sheet1_name=args.sheet1,
+                sheet2_name=args.sheet2,
+                find_all=args.all_ranges,
+                chunk_rows=args.chunk_rows
+            )
+        else:
+            success = compare_excel(
+                args.file1, args.file2,
+                ignore_columns=args.ignore,
+                sheet1_name=args.sheet1,
+                sheet2_name=args.sheet2,
+                key_columns=args.key
+            )
+        sys.exit(exit_code_for(success))
\ No newline at end of file
@@ -1,45 +1,94 @@
 import os
-import numpy as np
+import sys
+import profiling
+from polyphase import CHUNK_SIZE, StreamingDecimator, iter_stream
+from signal_io import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB, SignalWriter, load_signal, save_signal
 
-def batch_downsample_txt_files(input_folder, output_folder, downsample_factor):
+# 降采样方式：slice 直接每隔N个点取一个点，decimate 先做抗混叠低通滤波再抽取
+MODES = ('slice', 'decimate')
+
+def decimate_to_file(data, output_path, downsample_factor, output_format='txt',
+                     max_stage_factor=10, chunk_size=CHUNK_SIZE):
+    """
+    按块流式抗混叠降采样并逐块写出，只计算保留下来的样本
+    大因子按不超过 max_stage_factor 的多级级联处理，输出点数与 data[::downsample_factor] 相同
+    :return: (实际输出路径, 输出点数)
+    """
+    decimator = StreamingDecimator(downsample_factor, max_stage_factor)
+    shape = (decimator.output_length(len(data)),) + data.shape[1:]
+    with SignalWriter(output_path, output_format, shape) as writer:
+        for block in iter_stream(decimator, data, chunk_size):
+            writer.write(block)
+    return writer.path, writer.rows
+
+def downsample_file(input_path, output_path, downsample_factor, output_format='txt',
+                    cache_dir=DEFAULT_CACHE_DIR, mode='slice', cache_size=DEFAULT_CACHE_MB):
+    """
+    降采样单个TXT文件
+    :return: (实际输出路径, 原始点数, 降采样后点数)
+    """
+    # 读取数据
+    with profiling.stage('load_signal'):
+        data = load_signal(input_path, cache_dir, cache_size=cache_size)
+        profiling.count('samples_in', len(data))
+    
+    if mode == 'decimate':
+        # 抗混叠滤波后抽取，按块流式处理并写出
+        with profiling.stage('decimate', factor=downsample_factor):
+            output_path, downsampled_length = decimate_to_file(data, output_path, downsample_factor, output_format)
+    else:
+        # 执行降采样 - 每隔downsample_factor个点取一个点
+        downsampled_data = data[::downsample_factor]
+        downsampled_length = len(downsampled_data)
+        
+        # 保存结果
+        with profiling.stage('save_signal', format=output_format):
+            output_path = save_signal(output_path, downsampled_data, output_format)
+    profiling.count('samples_out', downsampled_length)
+    return output_path, len(data), downsampled_length
+
+def batch_downsample_txt_files(input_folder, output_folder, downsample_factor,
+                               output_format='txt', cache_dir=DEFAULT_CACHE_DIR, mode='slice',
+                               cache_size=DEFAULT_CACHE_MB):
     """
     批量降采样文件夹中的所有TXT文件
     :param input_folder: 输入文件夹路径(使用原始字符串或双反斜杠)
     :param output_folder: 输出文件夹路径
     :param downsample_factor: 降采样因子(如4表示每4个点取1个)
+    :param output_format: 输出格式 txt / npy / npz
+    :param cache_dir: 解析结果的 .npy 缓存目录，None 表示不使用缓存
+    :param mode: slice 直接抽取（无滤波，会产生混叠）；decimate 先做 FIR 抗混叠滤波再抽取
+    :param cache_size: 缓存总大小上限(MB)，超过时按最近使用时间淘汰
+    :return: 汇总信息 {'processed', 'failed', 'samples'}，单个文件出错时打印错误并继续处理其他文件
     """
+    if mode not in MODES:
+        raise ValueError(f"不支持的降采样方式: {mode} (可选: {', '.join(MODES)})")
+    
     # 确保输出文件夹存在
     os.makedirs(output_folder, exist_ok=True)
     
     # 获取输入文件夹中所有TXT文件
     txt_files = [f for f in os.listdir(input_folder) if f.lower().endswith('.txt')]
     
+    summary = {'processed': 0, 'failed': 0, 'samples': 0}
     for filename in txt_files:
         # 构造完整文件路径
         input_path = os.path.join(input_folder, filename)
         output_path = os.path.join(output_folder, f"downsampled_{filename}")
         
         try:
-            # 读取数据
-            data = np.loadtxt(input_path)
-            
-            # 执行降采样 - 每隔downsample_factor个点取一个点
-            downsampled_data = data[::downsample_factor]
-            
-            # 保存结果
-            np.savetxt(output_path, downsampled_data)
-            print(f"成功降采样: {filename} (原始点数: {len(data)}, 降采样后: {len(downsampled_data)})")
+            _, original_length, downsampled_length = downsample_file(
+                input_path, output_path, downsample_factor, output_format, cache_dir, mode, cache_size)
+            print(f"成功降采样: {filename} (原始点数: {original_length}, 降采样后: {downsampled_length})")
+            summary['processed'] += 1
+            summary['samples'] += original_length
             
         except Exception as e:
             print(f"处理文件 {filename} 时出错: {str(e)}")
+            summary['failed'] += 1
+    return summary
 
-# 使用示例
 if __name__ == "__main__":
-    # 设置参数 - 注意路径写法
-    input_dir = r"C:\Users\admin\Desktop\滑台注入数据\data"  # 原始字符串
-    output_dir = r"C:\Users\admin\Desktop\滑台注入数据\processed"  # 原始字符串
-    factor = 5  # 降采样因子(10000Hz→2000Hz需要factor=5)
-    
-    # 执行批量处理
-    batch_downsample_txt_files(input_dir, output_dir, factor)
-    print("批量降采样完成！")
\ No newline at end of file
+    # 命令行入口：python downsample.py 输入目录 输出目录 --factor 5 [--mode decimate] [--workers N]
+    from batch_driver import main
+    sys.exit(main(tool='downsample'))
@@ -0,0 +1,318 @@
+import os
+import pathlib
+import sqlite3
+import sys
+import time
+
+# 索引结构版本，表结构变化时递增
+INDEX_VERSION = 1
+
+# 查询结果的列名，与 check.py 结果文件一致
+RESULT_COLUMNS = ('G', 'H', '最小L值', '出现次数', '来源工作表')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS workbooks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    indexed_at REAL NOT NULL
+);
+-- 各工作簿的 gh_data：每个 (G, H) 的最小L值（无有效L值时为 NULL）和含该组合的工作表数，
+-- 以 (G, H) 开头的主键同时作为跨工作簿点查的索引
+CREATE TABLE IF NOT EXISTS gh (
+    g TEXT NOT NULL,
+    h TEXT NOT NULL,
+    workbook_id INTEGER NOT NULL,
+    min_l REAL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (g, h, workbook_id)
+) WITHOUT ROWID;
+-- 各工作簿中最小L值所在的工作表
+CREATE TABLE IF NOT EXISTS gh_sources (
+    g TEXT NOT NULL,
+    h TEXT NOT NULL,
+    workbook_id INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    PRIMARY KEY (g, h, workbook_id, sheet)
+) WITHOUT ROWID;
+-- 跨全部工作簿合并后的 gl_merged，即 check.py 结果文件的内容
+CREATE TABLE IF NOT EXISTS gl (
+    g TEXT NOT NULL,
+    min_l REAL NOT NULL,
+    h TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sources TEXT NOT NULL,
+    PRIMARY KEY (g, min_l)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS gl_min_l ON gl (min_l);
+"""
+
+class GLIndex:
+    """check.py 扫描结果的 SQLite 索引
+    
+    按工作簿保存 gh_data 和最小L值所在的工作表，同一工作簿重新写入时替换旧记录；
+    rebuild() 把全部工作簿合并为 gl 表（与批量扫描的合并结果一致）；G+H 查询直接按主键汇总各工作簿的记录。
+    查询只读带索引的表，不需要打开源工作簿。多个索引文件可用 merge_from() 合并。
+    """
+    
+    def __init__(self, path, readonly=False):
+        self.path = path
+        if readonly:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"索引文件不存在: {path}")
+            self.conn = sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+            self.conn.commit()
+        self._check_version()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.conn.rollback()
+        self.close()
+    
+    def close(self):
+        self.conn.close()
+    
+    def _check_version(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        version = int(row[0]) if row else None
+        if version != INDEX_VERSION:
+            raise ValueError(f"索引 {self.path} 的版本为 {version}，当前版本为 {INDEX_VERSION}，请重新生成索引")
+    
+    def _replace_workbook(self, path, name, mtime_ns, size, indexed_at):
+        """登记工作簿并清除其旧记录，返回工作簿 id"""
+        row = self.conn.execute("SELECT id FROM workbooks WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            cursor = self.conn.execute(
+                "INSERT INTO workbooks (path, name, mtime_ns, size, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (path, name, mtime_ns, size, indexed_at))
+            return cursor.lastrowid
+        
+        workbook_id = row[0]
+        self.conn.execute("UPDATE workbooks SET name = ?, mtime_ns = ?, size = ?, indexed_at = ? WHERE id = ?",
+                          (name, mtime_ns, size, indexed_at, workbook_id))
+        self.conn.execute("DELETE FROM gh WHERE workbook_id = ?", (workbook_id,))
+        self.conn.execute("DELETE FROM gh_sources WHERE workbook_id = ?", (workbook_id,))
+        return workbook_id
+    
+    def add_workbook(self, file_path, gh_data, gh_sources):
+        """写入（或替换）一个工作簿的 aggregate_partials 结果，source 列为工作表名
+        
+        写入后需调用 rebuild() 更新合并表并提交。
+        """
+        stat = os.stat(file_path)
+        workbook_id = self._replace_workbook(os.path.abspath(file_path), os.path.basename(file_path),
+                                             stat.st_mtime_ns, stat.st_size, time.time())
+        self.conn.executemany(
+            "INSERT INTO gh VALUES (?, ?, ?, ?, ?)",
+            ((str(g), str(h), workbook_id, None if min_l == float('inf') else float(min_l), int(count))
+             for g, h, min_l, count in gh_data[['G', 'H', 'min_l', 'count']].itertuples(index=False, name=None)))
+        self.conn.executemany(
+            "INSERT INTO gh_sources VALUES (?, ?, ?, ?)",
+            ((str(g), str(h), workbook_id, str(sheet))
+             for g, h, sheet in gh_sources[['G', 'H', 'source']].itertuples(index=False, name=None)))
+    
+    def merge_from(self, other_path):
+        """把另一个索引中的全部工作簿并入本索引，同一路径的工作簿以较新的索引记录为准
+        
+        返回并入的工作簿数；写入后需调用 rebuild()。
+        """
+        other = GLIndex(other_path, readonly=True)
+        try:
+            merged = 0
+            for workbook in other.workbooks():
+                row = self.conn.execute("SELECT indexed_at FROM workbooks WHERE path = ?",
+                                        (workbook['path'],)).fetchone()
+                if row is not None and row[0] >= workbook['indexed_at']:
+                    continue
+                workbook_id = self._replace_workbook(workbook['path'], workbook['name'], workbook['mtime_ns'],
+                                                     workbook['size'], workbook['indexed_at'])
+                self.conn.executemany(
+                    "INSERT INTO gh VALUES (?, ?, ?, ?, ?)",
+                    ((g, h, workbook_id, min_l, count) for g, h, min_l, count in other.conn.execute(
+                        "SELECT g, h, min_l, count FROM gh WHERE workbook_id = ?", (workbook['id'],))))
+                self.conn.executemany(
+                    "INSERT INTO gh_sources VALUES (?, ?, ?, ?)",
+                    ((g, h, workbook_id, sheet) for g, h, sheet in other.conn.execute(
+                        "SELECT g, h, sheet FROM gh_sources WHERE workbook_id = ?", (workbook['id'],))))
+                merged += 1
+            return merged
+        finally:
+            other.close()
+    
+    def rebuild(self):
+        """按 check.py 的合并规则重建跨工作簿的 gl 表并提交，返回 (G-H 组合数, gl 记录数)"""
+        import numpy as np
+        import pandas as pd
+        from check import merge_gl
+        
+        # 转为 object 类型，与 aggregate_partials 的结果一致（merge_gl 的字符串拼接在该类型上更快）
+        gh = pd.read_sql_query(
+            "SELECT gh.workbook_id, gh.g, gh.h, gh.min_l, gh.count, workbooks.name"
+            " FROM gh JOIN workbooks ON workbooks.id = gh.workbook_id", self.conn).astype({
+                'g': object, 'h': object, 'name': object})
+        sources = pd.read_sql_query("SELECT workbook_id, g, h, sheet FROM gh_sources", self.conn).astype({
+            'g': object, 'h': object, 'sheet': object})
+        
+        # 跨工作簿取最小L值、累加出现次数，来源只保留达到全局最小值的工作簿中的工作表
+        gh['min_l'] = gh['min_l'].fillna(np.inf)
+        grouped = gh.groupby(['g', 'h'], sort=False)
+        gh['global_min'] = grouped['min_l'].transform('min')
+        gh_data = grouped.agg(min_l=('min_l', 'min'), count=('count', 'sum')).reset_index()
+        gh_data = gh_data.rename(columns={'g': 'G', 'h': 'H'})
+        at_min = gh.loc[gh['min_l'] == gh['global_min'], ['workbook_id', 'g', 'h', 'name']]
+        sources = sources.merge(at_min, on=['workbook_id', 'g', 'h'])
+        gh_sources = pd.DataFrame({
+            'G': sources['g'],
+            'H': sources['h'],
+            'source': sources['name'] + ':' + sources['sheet']
+        })
+        gl_merged = merge_gl(gh_data, gh_sources)
+        
+        self.conn.execute("DELETE FROM gl")
+        self.conn.executemany(
+            "INSERT INTO gl VALUES (?, ?, ?, ?, ?)",
+            ((g, min_l, h, int(count), source if isinstance(source, str) else '')
+             for g, h, min_l, count, source in gl_merged.itertuples(index=False, name=None)))
+        self.conn.commit()
+        return len(gh_data), len(gl_merged)
+    
+    def workbooks(self):
+        cursor = self.conn.execute(
+            "SELECT id, path, name, mtime_ns, size, indexed_at FROM workbooks ORDER BY path")
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+    
+    def stats(self):
+        """各表记录数"""
+        counts = {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ('workbooks', 'gh', 'gl')}
+        counts['gh_groups'] = self.conn.execute("SELECT COUNT(*) FROM (SELECT DISTINCT g, h FROM gh)").fetchone()[0]
+        return counts
+    
+    def query_g(self, g):
+        """G 的全部合并结果，按最小L值从小到大，第一行即为该 G 的最小L值"""
+        return self.conn.execute(
+            "SELECT g, h, min_l, count, sources FROM gl WHERE g = ? ORDER BY min_l", (g,)).fetchall()
+    
+    def query_gh(self, g, h):
+        """(G, H) 组合的最小L值（无有效L值时为 None）、出现次数和来源工作表，不存在时返回 None"""
+        min_l, count = self.conn.execute(
+            "SELECT MIN(min_l), SUM(count) FROM gh WHERE g = ? AND h = ?", (g, h)).fetchone()
+        if count is None:
+            return None
+        sources = self.conn.execute(
+            "SELECT DISTINCT workbooks.name || ':' || gh_sources.sheet AS source"
+            " FROM gh JOIN gh_sources USING (g, h, workbook_id) JOIN workbooks ON workbooks.id = gh.workbook_id"
+            " WHERE gh.g = ? AND gh.h = ? AND gh.min_l IS ? ORDER BY source", (g, h, min_l)).fetchall()
+        return g, h, min_l, count, ', '.join(source for source, in sources)
+    
+    def query_l_range(self, low=None, high=None, g=None, limit=None):
+        """最小L值在 [low, high] 内的合并结果，按最小L值排序；g 不为 None 时只查该 G"""
+        conditions = []
+        params = []
+        if low is not None:
+            conditions.append("min_l >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("min_l <= ?")
+            params.append(high)
+        if g is not None:
+            conditions.append("g = ?")
+            params.append(g)
+        sql = "SELECT g, h, min_l, count, sources FROM gl"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY min_l, g"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+def print_rows(rows):
+    """按 check.py 结果文件的列输出查询结果（制表符分隔）"""
+    print('\t'.join(RESULT_COLUMNS))
+    for g, h, min_l, count, sources in rows:
+        print('\t'.join((g, h, '' if min_l is None else f"{min_l:g}", str(count), sources)))
+
+def build_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description="查询 check.py --index 生成的 G/最小L值 索引")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    g_parser = subparsers.add_parser("g", help="查询 G 的最小L值及来源工作表；指定 --h 时查询 G+H 组合")
+    g_parser.add_argument("index", help="索引文件")
+    g_parser.add_argument("g", help="G 列的值")
+    g_parser.add_argument("--h", help="H 列的值")
+    
+    range_parser = subparsers.add_parser("range", help="查询最小L值在 [LOW, HIGH] 内的记录")
+    range_parser.add_argument("index", help="索引文件")
+    range_parser.add_argument("low", type=float, help="L值下限（含）")
+    range_parser.add_argument("high", type=float, help="L值上限（含）")
+    range_parser.add_argument("--g", help="只查询该 G")
+    range_parser.add_argument("--limit", type=int, help="最多输出的记录数")
+    
+    merge_parser = subparsers.add_parser("merge", help="把多个索引合并到 OUTPUT（已存在时在其基础上合并）")
+    merge_parser.add_argument("output", help="合并后的索引文件")
+    merge_parser.add_argument("inputs", nargs="+", help="要并入的索引文件")
+    
+    info_parser = subparsers.add_parser("info", help="列出索引包含的工作簿和记录数")
+    info_parser.add_argument("index", help="索引文件")
+    return parser
+
+def main(argv=None):
+    """命令行入口，返回退出码：查询无结果时为 1"""
+    args = build_parser().parse_args(argv)
+    
+    if args.command == 'merge':
+        with GLIndex(args.output) as index:
+            for input_path in args.inputs:
+                merged = index.merge_from(input_path)
+                print(f"并入 {input_path}: {merged} 个工作簿")
+            gh_count, gl_count = index.rebuild()
+        print(f"合并完成: {gh_count} 个 G-H 组合, {gl_count} 条 G/最小L值 记录 -> {args.output}")
+        return 0
+    
+    try:
+        index = GLIndex(args.index, readonly=True)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"无法打开索引: {e}")
+        return 1
+    with index:
+        if args.command == 'info':
+            for workbook in index.workbooks():
+                indexed_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(workbook['indexed_at']))
+                print(f"{workbook['path']}  ({workbook['size']} 字节, 索引于 {indexed_at})")
+            stats = index.stats()
+            print(f"共 {stats['workbooks']} 个工作簿, {stats['gh_groups']} 个 G-H 组合, "
+                  f"{stats['gl']} 条 G/最小L值 记录")
+            return 0
+        
+        start = time.perf_counter()
+        if args.command == 'g' and args.h is not None:
+            row = index.query_gh(args.g, args.h)
+            rows = [row] if row is not None else []
+        elif args.command == 'g':
+            rows = index.query_g(args.g)
+        else:
+            rows = index.query_l_range(args.low, args.high, g=args.g, limit=args.limit)
+        elapsed = time.perf_counter() - start
+    
+    if not rows:
+        print("未找到匹配的记录")
+        return 1
+    print_rows(rows)
+    print(f"共 {len(rows)} 条记录, 查询用时 {elapsed * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
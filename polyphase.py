@@ -0,0 +1,158 @@
+from fractions import Fraction
+from math import gcd
+import numpy as np
+from scipy.signal import firwin, upfirdn
+
+# 流式处理时每块的输入样本数
+CHUNK_SIZE = 1 << 16
+
+def rational_ratio(original_rate, target_rate, max_denominator=10000):
+    """将 target_rate / original_rate 化为最简整数比 (up, down)"""
+    ratio = (Fraction(target_rate) / Fraction(original_rate)).limit_denominator(max_denominator)
+    return ratio.numerator, ratio.denominator
+
+def design_filter(up, down, window=('kaiser', 5.0)):
+    """按 scipy.signal.resample_poly 的方式设计抗混叠 FIR 滤波器
+    
+    返回 (h, n_pre_remove)：h 已乘以 up 并在前端补零，使输出样本位于滤波器中心；
+    n_pre_remove 为 upfirdn 输出开头需要丢弃的样本数。up == down == 1 时为直通滤波器。
+    """
+    if up == down == 1:
+        return np.ones(1), 0
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=window) * up
+    n_pre_pad = down - half_len % down
+    h = np.concatenate((np.zeros(n_pre_pad), h))
+    return h, (half_len + n_pre_pad) // down
+
+class StreamingResampler:
+    """按块流式有理数重采样，结果与 scipy.signal.resample_poly 逐点一致
+    
+    每块只在块前保留滤波器所需的输入历史（按 down 的整数倍对齐），用 upfirdn 计算
+    本块新产生的完整输出，内存占用与信号总长度无关。按时间轴（第 0 维）处理，支持多列数据。
+    依次调用 process() 处理各块，最后调用 flush() 取出尾部样本。
+    """
+    
+    def __init__(self, up, down, window=('kaiser', 5.0)):
+        g = gcd(up, down)
+        self.up, self.down = up // g, down // g
+        self.h, self.n_pre_remove = design_filter(self.up, self.down, window)
+        self._history = None    # 保留的输入历史
+        self._start = 0         # 历史第一个样本的全局输入序号（down 的整数倍）
+        self._n_in = 0          # 已输入的样本数
+        self._n_computed = 0    # 已计算的 upfirdn 全局输出数（含开头需丢弃的部分）
+        self._n_out = 0         # 已产出的样本数
+    
+    def output_length(self, n_in):
+        """输入 n_in 个样本时的输出样本数，与 resample_poly 一致"""
+        return -(-n_in * self.up // self.down)
+    
+    def _run(self, chunk):
+        """追加输入并计算所有已具备完整输入的新输出（全局 upfirdn 序号）"""
+        chunk = np.asarray(chunk, dtype=np.float64)
+        buffer = chunk if self._history is None else np.concatenate((self._history, chunk))
+        self._n_in += len(chunk)
+        end = self._start + len(buffer)
+        
+        # 全局输出 m 需要的输入最晚到 floor(m * down / up)，已全部到达时才计算
+        m_end = -(-end * self.up // self.down)
+        m_base = self._start * self.up // self.down
+        if m_end > self._n_computed:
+            y = upfirdn(self.h, buffer, self.up, self.down, axis=0)
+            y = y[self._n_computed - m_base:m_end - m_base]
+            self._n_computed = m_end
+        else:
+            y = buffer[:0]
+        
+        # 下一块仍需要的最早输入，向下对齐到 down 的整数倍，使 upfirdn 的输出网格与全局一致
+        need = max(0, (m_end * self.down - len(self.h) + 1) // self.up)
+        start = max(self._start, need - need % self.down)
+        self._history = buffer[start - self._start:]
+        self._start = start
+        return y
+    
+    def _emit(self, y, limit=None):
+        """丢弃开头的 n_pre_remove 个输出，limit 为输出总数上限"""
+        skip = max(0, self.n_pre_remove - (self._n_computed - len(y)))
+        y = y[skip:]
+        if limit is not None:
+            y = y[:max(0, limit - self._n_out)]
+        self._n_out += len(y)
+        return y
+    
+    def process(self, chunk):
+        """输入一块样本，返回本块产生的输出样本"""
+        return self._emit(self._run(chunk))
+    
+    def flush(self):
+        """输入结束，以零填充计算剩余的尾部输出"""
+        total = self.output_length(self._n_in)
+        n_in = self._n_in
+        target = self.n_pre_remove + total
+        pad = max(0, -(-target * self.down // self.up) - n_in)
+        shape = (pad,) + (self._history.shape[1:] if self._history is not None else ())
+        y = self._emit(self._run(np.zeros(shape)), limit=total)
+        self._n_in = n_in
+        return y
+
+def decimation_stages(factor, max_stage_factor=10):
+    """将降采样因子拆分为多级，每级不超过 max_stage_factor（更大的质因数单独成级），大因子在前"""
+    primes = []
+    n, p = factor, 2
+    while p * p <= n:
+        while n % p == 0:
+            primes.append(p)
+            n //= p
+        p += 1
+    if n > 1:
+        primes.append(n)
+    
+    stages = []
+    for p in sorted(primes, reverse=True):
+        for i, stage in enumerate(stages):
+            if stage * p <= max_stage_factor:
+                stages[i] *= p
+                break
+        else:
+            stages.append(p)
+    return sorted(stages, reverse=True)
+
+class StreamingDecimator:
+    """带抗混叠滤波的流式整数倍降采样
+    
+    每级为 up=1 的 StreamingResampler，upfirdn 只计算保留下来的样本；大因子拆分为多级级联，
+    各级滤波器长度保持在 20 * 级因子左右。单级时结果与 resample_poly(x, 1, factor) 逐点一致，
+    输出点数与 data[::factor] 相同。
+    """
+    
+    def __init__(self, factor, max_stage_factor=10, window=('kaiser', 5.0)):
+        self.factor = factor
+        self.stages = [StreamingResampler(1, stage, window)
+                       for stage in decimation_stages(factor, max_stage_factor)]
+    
+    def output_length(self, n_in):
+        return -(-n_in // self.factor)
+    
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        for stage in self.stages:
+            chunk = stage.process(chunk)
+        return chunk
+    
+    def flush(self):
+        """逐级冲出尾部样本：前一级的尾部作为后一级的最后一块输入"""
+        y = None
+        for stage in self.stages:
+            y = stage.flush() if y is None else np.concatenate((stage.process(y), stage.flush()))
+        return y if y is not None else np.zeros(0)
+
+def iter_stream(processor, data, chunk_size=CHUNK_SIZE):
+    """按块把 data 送入流式处理器（StreamingResampler / StreamingDecimator），逐块产出输出"""
+    for start in range(0, len(data), chunk_size):
+        y = processor.process(data[start:start + chunk_size])
+        if len(y):
+            yield y
+    y = processor.flush()
+    if len(y):
+        yield y
@@ -0,0 +1,255 @@
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+# 当前进程的性能记录器，未启用时为 None
+_state = {'profiler': None}
+
+def _proc_status():
+    """读取 /proc/self/status 中的 VmRSS / VmHWM (KB)，非 Linux 时返回空字典"""
+    try:
+        with open('/proc/self/status') as f:
+            fields = (line.split(':', 1) for line in f)
+            return {key: int(value.split()[0]) for key, value in fields if key in ('VmRSS', 'VmHWM')}
+    except OSError:
+        return {}
+
+def memory_usage():
+    """返回 (当前 RSS, 峰值 RSS)，单位 MB，无法获取的项为 None
+    
+    Linux 下峰值为上次 reset_peak() 之后的峰值；其他平台为进程启动以来的峰值。
+    """
+    status = _proc_status()
+    if status:
+        return status['VmRSS'] / 1024, status['VmHWM'] / 1024
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return info.rss / (1024 * 1024), getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def reset_peak():
+    """重置本进程的峰值 RSS（Linux 的 /proc/self/clear_refs），不支持时返回 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _children_peak_mb():
+    """已结束子进程（如进程池工作进程）中最大的峰值 RSS (MB)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _rounded(value, digits=4):
+    return round(value, digits) if isinstance(value, float) else value
+
+class Profiler:
+    """阶段级性能记录器
+    
+    每个阶段结束时以 JSON 行输出耗时、CPU 时间、RSS 和阶段内峰值内存，以及阶段内的计数器；
+    子阶段的计数器和峰值同时并入父阶段，最外层阶段即为整个运行的汇总。
+    profile_stage 指定的阶段在 cProfile 下运行，统计结果写入 pstats 文件，可用 python -m pstats 查看。
+    进程池工作进程通过 configure(get_config()) 以追加方式写入同一输出，每行带 pid 区分。
+    """
+    
+    def __init__(self, path, script, profile_stage=None, append=False):
+        self.path = path
+        self.script = script
+        self.profile_stage = profile_stage
+        self.worker = append
+        if path == '-':
+            self._out = sys.stderr
+        else:
+            if not append:
+                open(path, 'w').close()
+            # 主进程同样以追加方式写入，避免覆盖工作进程已写入的行
+            self._out = open(path, 'a', encoding='utf-8')
+        self._stack = []
+        self._cprofile = None
+        self._cprofile_depth = 0
+        self._max_peak = None
+        self._peak_per_stage = reset_peak()
+    
+    def config(self):
+        return {'path': self.path, 'script': self.script, 'profile_stage': self.profile_stage}
+    
+    def emit(self, event, **fields):
+        record = {'event': event, 'script': self.script, 'pid': os.getpid(), 'time': round(time.time(), 3)}
+        record.update(fields)
+        self._out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._out.flush()
+    
+    def pstats_path(self):
+        """cProfile 统计文件路径，工作进程的文件名中带 pid"""
+        base = self.path if self.path != '-' else f"{self.script}-profile"
+        pid = f".{os.getpid()}" if self.worker else ''
+        return f"{base}.{self.profile_stage}{pid}.pstats"
+    
+    def _note_peak(self, entry, peak):
+        if peak is not None:
+            entry['peak'] = peak if entry['peak'] is None else max(entry['peak'], peak)
+            self._max_peak = peak if self._max_peak is None else max(self._max_peak, peak)
+    
+    def count(self, name, n=1):
+        """累加当前阶段的计数器，没有活动阶段时忽略"""
+        if self._stack:
+            counters = self._stack[-1]['counters']
+            counters[name] = counters.get(name, 0) + n
+    
+    @contextmanager
+    def stage(self, name, **info):
+        if self._stack and self._peak_per_stage:
+            # 重置峰值前先把父阶段到目前为止的峰值记下
+            self._note_peak(self._stack[-1], memory_usage()[1])
+            reset_peak()
+        entry = {'name': name, 'counters': {}, 'peak': None}
+        self._stack.append(entry)
+        
+        profiling = name == self.profile_stage
+        if profiling:
+            if self._cprofile is None:
+                self._cprofile = cProfile.Profile()
+            if self._cprofile_depth == 0:
+                self._cprofile.enable()
+            self._cprofile_depth += 1
+        
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield entry
+        finally:
+            seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - cpu_start
+            if profiling:
+                self._cprofile_depth -= 1
+                if self._cprofile_depth == 0:
+                    self._cprofile.disable()
+                    self._cprofile.dump_stats(self.pstats_path())
+            
+            rss, peak = memory_usage()
+            self._note_peak(entry, peak)
+            stage_path = '/'.join(e['name'] for e in self._stack)
+            self._stack.pop()
+            fields = {
+                'stage': name,
+                'path': stage_path,
+                'seconds': round(seconds, 4),
+                'cpu_seconds': round(cpu_seconds, 4),
+                'rss_mb': _rounded(rss, 1),
+                'peak_rss_mb': _rounded(entry['peak'], 1),
+                'counters': {key: _rounded(value) for key, value in entry['counters'].items()},
+            }
+            if info:
+                fields['info'] = info
+            self.emit('stage', **fields)
+            
+            if self._stack:
+                parent = self._stack[-1]
+                self._note_peak(parent, entry['peak'])
+                for key, value in entry['counters'].items():
+                    parent['counters'][key] = parent['counters'].get(key, 0) + value
+    
+    def close(self):
+        fields = {
+            'peak_rss_mb': _rounded(self._max_peak, 1),
+            'children_peak_rss_mb': _rounded(_children_peak_mb(), 1),
+        }
+        if self._cprofile is not None:
+            fields['pstats'] = self.pstats_path()
+        self.emit('summary', **fields)
+        if self._out is not sys.stderr:
+            self._out.close()
+
+def enable(path, script, profile_stage=None, append=False):
+    """在当前进程启用性能记录，path 为 JSON 行输出文件（- 表示标准错误）"""
+    _state['profiler'] = Profiler(path, script, profile_stage, append)
+    return _state['profiler']
+
+def disable():
+    profiler = _state['profiler']
+    _state['profiler'] = None
+    if profiler is not None:
+        profiler.close()
+
+def get_config():
+    """当前性能记录配置，传给进程池的 initializer=configure；未启用时为 None"""
+    profiler = _state['profiler']
+    return profiler.config() if profiler is not None else None
+
+def configure(config):
+    """进程池工作进程的初始化函数：按主进程的配置以追加方式启用性能记录
+    
+    fork 方式启动的工作进程会继承主进程的记录器，这里总是先丢弃继承来的状态。
+    """
+    _state['profiler'] = None
+    if config is not None:
+        enable(config['path'], config['script'], config['profile_stage'], append=True)
+
+def stage(name, **info):
+    """记录一个阶段；未启用性能记录时为空操作"""
+    profiler = _state['profiler']
+    return profiler.stage(name, **info) if profiler is not None else nullcontext()
+
+def count(name, n=1):
+    """累加当前阶段的计数器；未启用性能记录时为空操作"""
+    profiler = _state['profiler']
+    if profiler is not None:
+        profiler.count(name, n)
+
+class _TimedStream:
+    """包装压缩包成员的读取流，把解压（inflate）耗时和解压字节数计入当前阶段"""
+    
+    def __init__(self, stream, profiler):
+        self._stream = stream
+        self._profiler = profiler
+    
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self._stream.read(size)
+        self._profiler.count('inflate_seconds', time.perf_counter() - start)
+        self._profiler.count('bytes_inflated', len(data))
+        return data
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def timed_stream(stream):
+    """启用性能记录时返回计时包装后的流，否则原样返回"""
+    profiler = _state['profiler']
+    return _TimedStream(stream, profiler) if profiler is not None else stream
+
+@contextmanager
+def session(path, script, profile_stage=None):
+    """命令行入口使用：path 不为 None 时启用性能记录，整个运行作为名为 script 的最外层阶段"""
+    if path is None:
+        yield
+        return
+    enable(path, script, profile_stage)
+    try:
+        with stage(script):
+            yield
+    finally:
+        disable()
+
+def add_arguments(parser):
+    """为命令行入口添加 --profile / --profile-stage 参数"""
+    parser.add_argument("--profile", metavar="PATH",
+                        help="记录各阶段的耗时、峰值内存和计数器，以 JSON 行写入 PATH（- 表示标准错误）")
+    parser.add_argument("--profile-stage", metavar="STAGE",
+                        help="在 cProfile 下运行该阶段，统计结果保存为 PATH.STAGE.pstats（需同时指定 --profile）")
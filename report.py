@@ -1,12 +1,31 @@
+import numpy as np
 import pandas as pd
 import os
 import sys
 from tqdm import tqdm
 import re
+from pandas.io.parsers import TextParser
+import profiling
+from writers import FORMATS, ResultWriter
+from xlsx_reader import column_letter, read_workbook_columns
 
 # 配置列索引（从0开始）
 COLUMN_INDICES = [6, 7, 11, 12, 17]  # G,H,L,M,Q列
 COLUMN_NAMES = ['G', 'H', 'L', 'M', 'Q']
+NUMERIC_COLUMNS = ['L', 'M', 'Q']
+
+# L 列全部为 int16 范围内的整数时以 int16 存储，空值记为该占位值，不落入任何L区间
+L_MISSING = np.iinfo(np.int16).min
+
+# 读取引擎：stream 单次打开工作簿并流式读取投影列，pandas 为逐表 read_excel
+ENGINES = ('stream', 'pandas')
+
+# 汇总表的关键点和查找首个非零Q值的L范围
+KEY_POINTS = [85, 100, 115]
+SUMMARY_L_RANGE = (50, 150)
+
+# 范围宽表的L区间（含两端）
+L_RANGES = [(85, 100), (100, 115)]
 
 def truncate_h_column(h_value):
     """保留H列最后9个字符"""
@@ -17,100 +36,293 @@ def sanitize_sheet_name(name, max_len=28):
     clean_name = re.sub(r'[\\/*?:[\]]', '', str(name))
     return clean_name[-max_len:] if len(clean_name) > max_len else clean_name
 
-def process_all_sheets(input_file):
+def l_fits_int16(values):
+    """L 列的非空值是否都是 int16 可表示的整数（L_MISSING 本身保留为空值占位）"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    return bool(np.all((values == np.round(values)) & (values > L_MISSING) & (values <= np.iinfo(np.int16).max)))
+
+def compact_l(values):
+    """L 列转为 int16，空值记为 L_MISSING；调用前须用 l_fits_int16 确认其余值都可无损表示"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), L_MISSING, values).astype(np.int16)
+
+def read_sheets_pandas(input_file):
+    """逐表调用 read_excel 读取所需列，返回 {工作表名: 列式数据}
+    
+    G/H 为字典编码 (codes, values)，values 保持本表列的类型；L/M/Q 为 float64。
+    """
+    sheets = {}
+    with pd.ExcelFile(input_file) as xl:
+        for sheet in xl.sheet_names:
+            with profiling.stage('read_sheet', sheet=sheet):
+                df = xl.parse(sheet_name=sheet, usecols=COLUMN_INDICES)
+            df.columns = COLUMN_NAMES
+            data = {}
+            for name in COLUMN_NAMES:
+                if name in NUMERIC_COLUMNS:
+                    data[name] = pd.to_numeric(df[name], errors='coerce').to_numpy(np.float64)
+                else:
+                    codes, values = pd.factorize(df[name])
+                    data[name] = (codes.astype(np.int32), np.asarray(values))
+            sheets[sheet] = data
+    return sheets
+
+def infer_text_column(codes, values):
+    """按 read_excel 的列类型推断规则转换单个工作表的字典编码列，与 pandas 引擎的结果一致
+    
+    本表字典中的唯一值（有空单元格时再加一个空值）交给 read_excel 所用的 TextParser 推断类型：
+    如含空值的整数列转为 float64、数字文本转为数值；转换后相同的值合并为同一编码。
+    """
+    rows = [['v']] + [[value] for value in values] + ([['']] if (codes < 0).any() else [])
+    column = TextParser(rows, header=0, skip_blank_lines=False).read()['v']
+    local, uniques = pd.factorize(column.iloc[:len(values)])
+    return np.append(local, -1).astype(np.int32)[codes], np.asarray(uniques)
+
+def read_sheets_stream(input_file, workers=1):
+    """单次打开工作簿，只流式解析所需列，返回 {工作表名: 列式数据}
+    
+    G/H 为字典编码 (codes, values)，按 read_excel 的规则推断本表列的类型；L/M/Q 为 float64（文本和空单元格为 NaN）。
+    """
+    letters = {name: column_letter(index) for name, index in zip(COLUMN_NAMES, COLUMN_INDICES)}
+    sheets = read_workbook_columns(
+        input_file,
+        columns=[letters[name] for name in COLUMN_NAMES],
+        numeric_columns=[letters[name] for name in NUMERIC_COLUMNS],
+        workers=workers,
+        encode_text=True
+    )
+    return {
+        sheet: {name: data[letters[name]] if name in NUMERIC_COLUMNS else infer_text_column(*data[letters[name]])
+                for name in COLUMN_NAMES}
+        for sheet, data in sheets.items()
+    }
+
+def promote_values(parts):
+    """按 pd.concat 的类型提升规则统一各表字典值的类型，返回各表的 object 数组
+    
+    例如某表该列为 float64 时，其他纯整数表的值也转为浮点数；含文本的表合并后为 object，各值保持原类型。
+    含空值的表追加一个 NaN 参与推断，与整列合并的结果一致。
+    """
+    series = [pd.Series(np.append(values, np.nan) if (codes < 0).any() else values) for codes, values in parts]
+    combined = pd.concat(series, ignore_index=True).to_numpy(dtype=object)
+    promoted = []
+    start = 0
+    for (_, values), part in zip(parts, series):
+        promoted.append(combined[start:start + len(values)])
+        start += len(part)
+    return promoted
+
+def merge_encoded(parts):
+    """将各工作表的字典编码 (codes, values) 合并为一个 Categorical
+    
+    值的类型先按整列合并的规则统一；只为每个唯一值建一次全局编码，各表的编码直接映射写入预分配数组，不展开原始值；
+    类别按值排序，分组结果的顺序与按原始值分组一致。
+    """
+    total = sum(len(codes) for codes, _ in parts)
+    merged = np.empty(total, dtype=np.int32)
+    positions = {}
+    start = 0
+    for (codes, _), values in zip(parts, promote_values(parts)):
+        local = np.fromiter((positions.setdefault(v, len(positions)) for v in values),
+                            dtype=np.int32, count=len(values))
+        merged[start:start + len(codes)] = np.append(local, -1)[codes]  # -1 仍映射为 -1
+        start += len(codes)
+    
+    order, categories = pd.factorize(np.array(list(positions), dtype=object), sort=True)
+    return pd.Categorical.from_codes(np.append(order, -1)[merged], categories=categories)
+
+def derive_h_short(codes, values):
+    """按本表 H 的每个唯一值计算一次 H_short，返回字典编码 (codes, values)（空 H 对应空字符串）
+    
+    与合并前逐表截断一致：同一个 H 值在整数列和浮点数列中的截断结果不同。
+    """
+    short = np.array([truncate_h_column(value) for value in values] + [truncate_h_column(np.nan)], dtype=object)
+    return np.where(codes < 0, len(values), codes).astype(np.int32), short
+
+def build_combined_frame(sheets):
+    """将各工作表的列式数据合并为一个紧凑的 DataFrame
+    
+    G、H、H_short、Sheet 为 Categorical；L 的非空值全部为整数时为 int16，否则保持 float64，不丢弃任何值；
+    M、Q 保持 float64，写出的数值与输入一致。数值列按表依次写入预分配数组，不经过 pd.concat 的整表复制。
+    """
+    lengths = [len(data['L']) for data in sheets.values()]
+    total = sum(lengths)
+    l_compact = all(l_fits_int16(data['L']) for data in sheets.values())
+    numeric = {'L': np.empty(total, dtype=np.int16 if l_compact else np.float64),
+               'M': np.empty(total, dtype=np.float64),
+               'Q': np.empty(total, dtype=np.float64)}
+    start = 0
+    for data, length in zip(sheets.values(), lengths):
+        numeric['L'][start:start + length] = compact_l(data['L']) if l_compact else data['L']
+        numeric['M'][start:start + length] = data['M']
+        numeric['Q'][start:start + length] = data['Q']
+        start += length
+    
+    sheet_codes = np.repeat(np.arange(len(sheets), dtype=np.int32), lengths)
+    return pd.DataFrame({
+        'G': merge_encoded([data['G'] for data in sheets.values()]),
+        'H': merge_encoded([data['H'] for data in sheets.values()]),
+        'L': numeric['L'],
+        'M': numeric['M'],
+        'Q': numeric['Q'],
+        'H_short': merge_encoded([derive_h_short(*data['H']) for data in sheets.values()]),
+        'Sheet': pd.Categorical.from_codes(sheet_codes, categories=list(sheets))  # 标记来源工作表
+    }, copy=False)
+
+def process_all_sheets(input_file, fmt='xlsx', per_group_sheets=False, engine='stream', workers=1):
+    """处理工作簿并写出合并结果，完成时返回 True，出错时打印错误并返回 False"""
     print(f"\n处理文件: {input_file} (大小: {round(os.path.getsize(input_file)/(1024*1024),2)}MB)")
     
     try:
-        xl = pd.ExcelFile(input_file)
-        all_sheets_data = []
-        
         # 首先收集所有工作表的数据
-        for sheet in xl.sheet_names:
-            df = pd.read_excel(
-                input_file,
-                sheet_name=sheet,
-                usecols=COLUMN_INDICES,
-                dtype={'L': 'int32', 'Q': 'float32'}
-            )
-            df.columns = COLUMN_NAMES
-            df['H_short'] = df['H'].apply(truncate_h_column)
-            df['Sheet'] = sheet  # 标记来源工作表
-            all_sheets_data.append(df)
+        with profiling.stage('read_sheets', engine=engine):
+            if engine == 'pandas':
+                sheets = read_sheets_pandas(input_file)
+            else:
+                sheets = read_sheets_stream(input_file, workers)
         
-        if not all_sheets_data:
+        if not sheets:
             print("没有有效数据，跳过处理")
-            return
-            
+            return True
+        
         # 合并所有工作表数据
-        combined_df = pd.concat(all_sheets_data, ignore_index=True)
+        with profiling.stage('build_combined_frame'):
+            combined_df = build_combined_frame(sheets)
+            profiling.count('rows_combined', len(combined_df))
+        del sheets
+        print(f"合并数据: {len(combined_df)} 行, "
+              f"{combined_df.memory_usage(deep=True).sum() / (1024 * 1024):.1f}MB")
         
         # 处理合并后的数据
-        output_file = f"{os.path.splitext(input_file)[0]}_combined_output.xlsx"
-        with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+        output_file = f"{os.path.splitext(input_file)[0]}_combined_output.{fmt}"
+        with ResultWriter(output_file, fmt) as writer:
+            range_tables = {l_range: [] for l_range in L_RANGES}
             for m in [0, 1]:
                 if m in combined_df['M'].values:
-                    process_m_data(combined_df[combined_df['M'] == m].copy(), m, writer)
+                    m_df = combined_df[combined_df['M'] == m]
+                    process_m_data(m_df, m, writer, per_group_sheets)
+                    if not per_group_sheets:
+                        for l_range in L_RANGES:
+                            with profiling.stage('range_table', m=m, l_range=l_range):
+                                range_tables[l_range].append(build_range_table(m_df, l_range, m))
+            
+            # 每个L区间写为一个汇总宽表
+            for (lo, hi), tables in range_tables.items():
+                tables = [table for table in tables if not table.empty]
+                if tables:
+                    writer.write_sheet(f"Range_{lo}-{hi}", pd.concat(tables, ignore_index=True))
         
         print(f"\n结果保存到: {output_file}")
+        return True
     except Exception as e:
         print(f"\n处理失败: {str(e)}")
+        return False
+
+def summarize_groups(df, m):
+    """向量化生成单个M值的汇总表
 
-def process_m_data(df, m, writer):
-    """处理单个M值的数据"""
-    summary_data = []
+    一次遍历建立 (组 × L) 的行位置矩阵：对每个 (G, H_short) 组和 50-150 范围内的每个 L，
+    记录组内第一条 L 等于该值的行，据此同时得到所有组的 Q@L85/100/115、First_L/First_Q，
+    结果与逐组、逐 L 筛选完全一致。
+    """
+    df = df.reset_index(drop=True)
+    grouped = df.groupby(['G', 'H_short'], observed=True)
+    n_groups = grouped.ngroups
+    if n_groups == 0:
+        return pd.DataFrame()
     
-    # 按G和H_short分组
-    grouped = df.groupby(['G', 'H_short'])
+    # 分组键为空的行不属于任何组，编号记为 -1
+    group_ids = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    summary = grouped['Sheet'].nunique().rename('数据来源').reset_index()  # 涉及的工作表数量
     
-    for (g, h_short), group in tqdm(grouped, desc=f"处理M={m}"):
-        try:
-            # 获取原始H值
-            original_h = group['H'].iloc[0] if not group.empty else ""
-            
-            # 关键点数据
-            key_data = {}
-            for l in [85, 100, 115]:
-                match = group[group['L'] == l]
-                if not match.empty:
-                    key_data[f"Q@L{l}"] = match['Q'].iloc[0]
-                else:
-                    key_data[f"Q@L{l}"] = None
-            
-            # 查找第一个非零Q值（完整50-150范围）
-            first_non_zero = None
-            for l in range(50, 151):
-                match = group[group['L'] == l]
-                if not match.empty and match['Q'].iloc[0] != 0:
-                    first_non_zero = match.iloc[0]
-                    break
-            
-            # 添加到汇总
-            summary_data.append({
-                'G': g,
-                'H_short': h_short,
-                'H_full': original_h,
-                'M': m,
-                **key_data,
-                'First_L': first_non_zero['L'] if first_non_zero is not None else None,
-                'First_Q': first_non_zero['Q'] if first_non_zero is not None else None,
-                '数据来源': group['Sheet'].nunique()  # 涉及的工作表数量
-            })
-            
-            # 处理范围数据（确保去重）
-            process_range_data(group, g, h_short, m, writer)
-            
-        except Exception as e:
-            print(f"\n处理组 {g}_{h_short} 出错: {str(e)}")
-            continue
+    # 每组第一行的原始H值
+    _, first_rows = np.unique(group_ids, return_index=True)
+    if group_ids.min() < 0:
+        first_rows = first_rows[1:]  # 跳过分组键为空的行
+    summary.insert(2, 'H_full', df['H'].to_numpy()[first_rows])
+    summary.insert(3, 'M', m)
+    
+    # (组 × L) 行位置矩阵，-1 表示该组没有这个 L 值
+    lo, hi = SUMMARY_L_RANGE
+    width = hi - lo + 1
+    l_values = df['L'].to_numpy()
+    rows = np.flatnonzero(df['L'].isin(range(lo, hi + 1)).to_numpy() & (group_ids >= 0))
+    cells = group_ids[rows] * width + l_values[rows].astype(np.int64) - lo
+    cells, first = np.unique(cells, return_index=True)  # 同一 (组, L) 只取第一条
+    positions = np.full(n_groups * width, -1, dtype=np.int64)
+    positions[cells] = rows[first]
+    positions = positions.reshape(n_groups, width)
+    
+    present = positions >= 0
+    q_matrix = df['Q'].to_numpy()[np.where(present, positions, 0)]
+    
+    # 关键点数据
+    for l in KEY_POINTS:
+        column = l - lo
+        summary[f"Q@L{l}"] = pd.Series(q_matrix[:, column]).where(present[:, column])
+    
+    # 查找第一个非零Q值（完整50-150范围）
+    hit = present & (q_matrix != 0)
+    has_hit = hit.any(axis=1)
+    first_pos = positions[np.arange(n_groups), hit.argmax(axis=1)]
+    summary['First_L'] = pd.Series(l_values[first_pos]).where(has_hit)
+    summary['First_Q'] = pd.Series(df['Q'].to_numpy()[first_pos]).where(has_hit)
+    
+    columns = ['G', 'H_short', 'H_full', 'M'] + [f"Q@L{l}" for l in KEY_POINTS] + ['First_L', 'First_Q', '数据来源']
+    return summary[columns]
+
+def process_m_data(df, m, writer, per_group_sheets=False):
+    """处理单个M值的数据，per_group_sheets 为 True 时为每个组单独写出范围工作表"""
+    if per_group_sheets:
+        # 按G和H_short分组
+        grouped = df.groupby(['G', 'H_short'], observed=True)
+        
+        for (g, h_short), group in tqdm(grouped, desc=f"处理M={m}"):
+            try:
+                # 处理范围数据（确保去重）
+                process_range_data(group, g, h_short, m, writer)
+                
+            except Exception as e:
+                print(f"\n处理组 {g}_{h_short} 出错: {str(e)}")
+                continue
     
     # 写入汇总表
-    if summary_data:
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel(
-            writer,
-            sheet_name=f"Summary_M{m}",
-            index=False
-        )
+    with profiling.stage('summarize_groups', m=m):
+        summary_df = summarize_groups(df, m)
+        profiling.count('groups', len(summary_df))
+    if not summary_df.empty:
+        writer.write_sheet(f"Summary_M{m}", summary_df)
+
+def build_range_table(df, l_range, m):
+    """向量化构建一个L区间的宽表
+
+    所有组一次完成透视：每个 (G, H_short) 一行，列为 G, H, M, L{lo}..L{hi}，
+    取值为组内第一条该 L 值记录的 Q；只包含在该区间内有数据的组，行按 (G, H_short) 排序。
+    """
+    lo, hi = l_range
+    columns = ['G', 'H', 'M'] + [f"L{l}" for l in range(lo, hi + 1)]
+    l_values = pd.to_numeric(df['L'], errors='coerce')
+    in_range = df[(l_values >= lo) & (l_values <= hi) & df['G'].notna()]
+    if in_range.empty:
+        return pd.DataFrame(columns=columns)
+    
+    keys = ['G', 'H_short']
+    groups = pd.MultiIndex.from_frame(in_range[keys].drop_duplicates()).sort_values()
+    
+    # 同一组同一 L 只取第一条记录
+    l_in_range = l_values.loc[in_range.index]
+    points = in_range.assign(L=l_in_range)[l_in_range == l_in_range.round()]
+    points = points.drop_duplicates(keys + ['L'])
+    table = (
+        points.set_index(keys + [points['L'].astype(int)])['Q']
+        .unstack()
+        .reindex(index=groups, columns=range(lo, hi + 1))
+    )
+    table.columns = columns[3:]
+    table = table.reset_index().rename(columns={'H_short': 'H'})
+    table.insert(2, 'M', m)
+    return table[columns]
 
 def process_range_data(group, g, h_short, m, writer):
     """处理并写入范围数据（确保去重）"""
@@ -135,11 +347,7 @@ def process_range_data(group, g, h_short, m, writer):
         
         # 写入
         sheet_name = sanitize_sheet_name(f"{g}_{h_short}_85-100_M{m}")
-        transposed.to_excel(
-            writer,
-            sheet_name=sheet_name,
-            index=False
-        )
+        writer.write_sheet(sheet_name, transposed)
     
     # 100-115范围
     range_100_115 = unique_data[
@@ -157,20 +365,28 @@ def process_range_data(group, g, h_short, m, writer):
         transposed.insert(2, 'M', m)
         
         sheet_name = sanitize_sheet_name(f"{g}_{h_short}_100-115_M{m}")
-        transposed.to_excel(
-            writer,
-            sheet_name=sheet_name,
-            index=False
-        )
+        writer.write_sheet(sheet_name, transposed)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使用方法: python report.py 文件名.xlsx")
-        sys.exit(1)
+    import argparse
+    parser = argparse.ArgumentParser(description="Excel G/H 汇总报表工具")
+    parser.add_argument("input_file", help="要处理的Excel文件")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), default="xlsx",
+                        help="输出格式，csv/parquet 时每个工作表输出一个文件 (默认: xlsx)")
+    parser.add_argument("--per-group-sheets", action="store_true",
+                        help="按旧版布局为每个组、L区间和M值单独输出一个工作表")
+    parser.add_argument("--engine", choices=ENGINES, default="stream",
+                        help="读取引擎: stream 流式读取所需列, pandas 逐表 read_excel (默认: stream)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="stream 引擎并行读取工作表的进程数 (默认: 1)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
     
-    input_file = sys.argv[1]
+    input_file = args.input_file
     if not os.path.exists(input_file):
         print(f"文件不存在: {input_file}")
         sys.exit(1)
     
-    process_all_sheets(input_file)
\ No newline at end of file
+    with profiling.session(args.profile, 'report', args.profile_stage):
+        process_all_sheets(input_file, fmt=args.format, per_group_sheets=args.per_group_sheets,
+                           engine=args.engine, workers=args.workers)
\ No newline at end of file
@@ -1,52 +1,101 @@
 import os
-import numpy as np
+import sys
+import profiling
 from scipy import signal
+from polyphase import CHUNK_SIZE, StreamingResampler, iter_stream, rational_ratio
+from signal_io import DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB, SignalWriter, load_signal, save_signal
 
-def batch_resample_txt_files(input_folder, output_folder, original_rate, target_rate):
+# 重采样方式：fft 为整段 FFT 重采样，poly 为按块流式多相滤波重采样
+METHODS = ('fft', 'poly')
+
+def resample_poly_to_file(data, output_path, original_rate, target_rate,
+                          output_format='txt', chunk_size=CHUNK_SIZE):
+    """
+    按块流式多相重采样并逐块写出，结果与 scipy.signal.resample_poly 逐点一致
+    输入和输出都按块处理，内存占用与信号长度无关
+    :return: (实际输出路径, 输出点数)
+    """
+    up, down = rational_ratio(original_rate, target_rate)
+    resampler = StreamingResampler(up, down)
+    shape = (resampler.output_length(len(data)),) + data.shape[1:]
+    with SignalWriter(output_path, output_format, shape) as writer:
+        for block in iter_stream(resampler, data, chunk_size):
+            writer.write(block)
+    return writer.path, writer.rows
+
+def resample_file(input_path, output_path, original_rate, target_rate, output_format='txt',
+                  cache_dir=DEFAULT_CACHE_DIR, method='fft', cache_size=DEFAULT_CACHE_MB):
+    """
+    重采样单个TXT文件
+    :return: (实际输出路径, 原始点数, 重采样后点数)
+    """
+    with profiling.stage('load_signal'):
+        data = load_signal(input_path, cache_dir, cache_size=cache_size)
+        original_length = len(data)
+        profiling.count('samples_in', original_length)
+    
+    if method == 'poly':
+        # 按块流式多相重采样，边处理边写出
+        with profiling.stage('resample_poly'):
+            output_path, target_length = resample_poly_to_file(data, output_path, original_rate, target_rate, output_format)
+    else:
+        # 计算重采样后的点数
+        target_length = int(original_length * target_rate / original_rate)
+        
+        # 执行重采样
+        with profiling.stage('resample_fft'):
+            resampled_data = signal.resample(data, target_length)
+        
+        # 保存结果
+        with profiling.stage('save_signal', format=output_format):
+            output_path = save_signal(output_path, resampled_data, output_format)
+    profiling.count('samples_out', target_length)
+    return output_path, original_length, target_length
+
+def batch_resample_txt_files(input_folder, output_folder, original_rate, target_rate,
+                             output_format='txt', cache_dir=DEFAULT_CACHE_DIR, method='fft',
+                             cache_size=DEFAULT_CACHE_MB):
     """
     批量重采样文件夹中的所有TXT文件
     :param input_folder: 输入文件夹路径
     :param output_folder: 输出文件夹路径
     :param original_rate: 原始采样率(Hz)
     :param target_rate: 目标采样率(Hz)
+    :param output_format: 输出格式 txt / npy / npz
+    :param cache_dir: 解析结果的 .npy 缓存目录，None 表示不使用缓存
+    :param method: fft 为整段 FFT 重采样；poly 按 target_rate/original_rate 的最简整数比做流式多相重采样，
+                   无首尾环绕失真，输出点数为 ceil(原始点数 * up / down)
+    :param cache_size: 缓存总大小上限(MB)，超过时按最近使用时间淘汰
+    :return: 汇总信息 {'processed', 'failed', 'samples'}，单个文件出错时打印错误并继续处理其他文件
     """
+    if method not in METHODS:
+        raise ValueError(f"不支持的重采样方式: {method} (可选: {', '.join(METHODS)})")
+    
     # 确保输出文件夹存在
     os.makedirs(output_folder, exist_ok=True)
     
     # 获取输入文件夹中所有TXT文件
     txt_files = [f for f in os.listdir(input_folder) if f.endswith('.txt')]
     
+    summary = {'processed': 0, 'failed': 0, 'samples': 0}
     for filename in txt_files:
         # 构造完整文件路径
         input_path = os.path.join(input_folder, filename)
         output_path = os.path.join(output_folder, f"resampled_{filename}")
         
-        # 读取数据
         try:
-            data = np.loadtxt(input_path)
-            
-            # 计算重采样后的点数
-            original_length = len(data)
-            target_length = int(original_length * target_rate / original_rate)
-            
-            # 执行重采样
-            resampled_data = signal.resample(data, target_length)
-            
-            # 保存结果
-            np.savetxt(output_path, resampled_data)
-            print(f"成功处理: {filename} -> resampled_{filename}")
+            output_path, original_length, _ = resample_file(input_path, output_path, original_rate, target_rate,
+                                                            output_format, cache_dir, method, cache_size)
+            print(f"成功处理: {filename} -> {os.path.basename(output_path)}")
+            summary['processed'] += 1
+            summary['samples'] += original_length
             
         except Exception as e:
             print(f"处理文件 {filename} 时出错: {str(e)}")
+            summary['failed'] += 1
+    return summary
 
-# 使用示例
 if __name__ == "__main__":
-    # 设置参数
-    input_dir = r"C:\Users\admin\Desktop\滑台注入数据\data"  # 输入文件夹路径
-    output_dir = r"C:\Users\admin\Desktop\滑台注入数据\processed"  # 输出文件夹路径
-    original_fs = 10000  # 原始采样率(Hz)
-    target_fs = 2000  # 目标采样率(Hz)
-    
-    # 执行批量处理
-    batch_resample_txt_files(input_dir, output_dir, original_fs, target_fs)
-    print("批量重采样完成！")
\ No newline at end of file
+    # 命令行入口：python resample.py 输入目录 输出目录 --original-rate 10000 --target-rate 2000 [--method poly]
+    from batch_driver import main
+    sys.exit(main(tool='resample'))
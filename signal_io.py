@@ -0,0 +1,222 @@
+import hashlib
+import os
+import warnings
+import numpy as np
+import profiling
+
+# 解析后数组的缓存位置和总大小上限 (MB)，超过上限时按最近使用时间 (LRU) 淘汰
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'signal_io')
+DEFAULT_CACHE_MB = 1024
+
+# 分块解析 / 写出的行数
+CHUNK_ROWS = 1 << 18
+
+# 支持的输出格式
+OUTPUT_FORMATS = ('txt', 'npy', 'npz')
+
+def _count_lines(path, block_size=1 << 24):
+    """统计文件行数（按字节块计数换行符），作为预分配行数的上限"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    return lines + (last != b'\n')
+
+def _count_columns(path):
+    """读取第一行数据的列数，跳过空行和 # 注释行"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                return len(line.split())
+    return 0
+
+def parse_signal(path, out=None, chunk_rows=CHUNK_ROWS):
+    """用 numpy 的 C 解析器分块读取空白分隔的文本信号，直接写入预分配数组
+    
+    out 为 None 时分配内存数组，也可传入由 allocate(shape) 创建的数组（如 .npy 内存映射）。
+    与 np.loadtxt 一致：# 之后为注释，空行跳过，单列数据返回一维数组。
+    返回 (数组, 实际行数)；数组行数为预分配的上限，调用方按实际行数截取。
+    """
+    columns = _count_columns(path)
+    capacity = _count_lines(path)
+    shape = (capacity, columns) if columns > 1 else (capacity,)
+    data = out(shape) if callable(out) else np.empty(shape, dtype=np.float64)
+    
+    rows = 0
+    if columns:
+        with open(path, 'r', encoding='utf-8') as f, warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # 读到文件末尾时的空块警告
+            while True:
+                values = np.loadtxt(f, dtype=np.float64, max_rows=chunk_rows, ndmin=2 if columns > 1 else 1)
+                if not len(values):
+                    break
+                data[rows:rows + len(values)] = values
+                rows += len(values)
+    return data, rows
+
+def cache_path_for(path, cache_dir=DEFAULT_CACHE_DIR):
+    """源文件对应的缓存文件路径，按绝对路径、修改时间和大小区分版本"""
+    stat = os.stat(path)
+    source = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    return os.path.join(cache_dir, f"{source}-{version}.npy")
+
+def _remove_stale(cache_file):
+    """删除同一源文件的旧版本缓存"""
+    cache_dir, name = os.path.split(cache_file)
+    source = name.split('-', 1)[0]
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(source + '-') and entry != name:
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except OSError:
+                pass
+
+def evict_cache(cache_dir, max_bytes, keep=None):
+    """按最近使用时间淘汰缓存，直到总大小不超过上限；keep 为刚写入、不参与淘汰的缓存文件"""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.npy') and '.tmp' not in entry.name and entry.path != keep:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # 已被其他进程淘汰
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    if keep is not None:
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def load_signal(path, cache_dir=DEFAULT_CACHE_DIR, mmap=True, cache_size=DEFAULT_CACHE_MB):
+    """读取文本信号，cache_dir 不为 None 时使用 .npy 缓存
+    
+    缓存命中时以内存映射方式打开（mmap 为 False 时读入内存），几乎不耗时；
+    未命中时直接解析到缓存文件的内存映射中，完成后原子替换，避免中断留下不完整的缓存。
+    每次新写入缓存后按最近使用时间淘汰旧缓存，使缓存目录总大小不超过 cache_size (MB)。
+    """
+    if cache_dir is None:
+        data, rows = parse_signal(path)
+        return data[:rows]
+    
+    cache_file = cache_path_for(path, cache_dir)
+    hit = os.path.exists(cache_file)
+    if hit:
+        try:
+            os.utime(cache_file)  # 刷新最近使用时间
+        except OSError:
+            hit = False  # 刚被其他进程淘汰
+    profiling.count('cache_hits' if hit else 'cache_misses')
+    if not hit:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            def allocate(shape):
+                return np.lib.format.open_memmap(tmp_file, mode='w+', dtype=np.float64, shape=shape)
+            
+            data, rows = parse_signal(path, out=allocate)
+            if rows != len(data):
+                # 含空行或注释行时预分配偏大，另存为实际行数
+                trimmed_file = f"{tmp_file}.npy"
+                np.save(trimmed_file, data[:rows])
+                del data
+                os.replace(trimmed_file, cache_file)
+            else:
+                data.flush()
+                del data
+                os.replace(tmp_file, cache_file)
+            _remove_stale(cache_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        # 先打开本次的缓存再淘汰，其他进程同时淘汰时不影响已打开的数组
+        data = np.load(cache_file, mmap_mode='r' if mmap else None)
+        evict_cache(cache_dir, cache_size * 1024 * 1024, keep=cache_file)
+        return data
+    
+    return np.load(cache_file, mmap_mode='r' if mmap else None)
+
+def output_path_for(path, fmt='txt'):
+    """按输出格式调整文件扩展名"""
+    if fmt == 'txt':
+        return path
+    return f"{os.path.splitext(path)[0]}.{fmt}"
+
+class SignalWriter:
+    """分块写出信号，返回的 path 为按格式调整扩展名后的实际路径
+
+    txt 逐块格式化后追加，格式与 np.savetxt 的默认格式 (%.18e, 空格分隔) 完全一致；
+    npy 在给出 shape 时直接写入预分配的内存映射，内存占用与信号长度无关；
+    npz（以及未给出 shape 的 npy）在关闭时一次写出，npz 中数组的键名为 data。
+    """
+
+    def __init__(self, path, fmt='txt', shape=None, chunk_rows=CHUNK_ROWS):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt} (可选: {', '.join(OUTPUT_FORMATS)})")
+        self.path = output_path_for(path, fmt)
+        self.fmt = fmt
+        self.rows = 0
+        self._chunk_rows = chunk_rows
+        self._file = None
+        self._array = None
+        self._chunks = []
+        self._closed = False
+        if fmt == 'txt':
+            self._file = open(self.path, 'w')
+        elif fmt == 'npy' and shape is not None:
+            self._array = np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float64, shape=tuple(shape))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if self._file is not None:
+            row_format = ' '.join(['%.18e'] * (chunk.shape[1] if chunk.ndim > 1 else 1)) + '\n'
+            for start in range(0, len(chunk), self._chunk_rows):
+                block = chunk[start:start + self._chunk_rows]
+                self._file.write(row_format * len(block) % tuple(block.ravel().tolist()))
+        elif self._array is not None:
+            self._array[self.rows:self.rows + len(chunk)] = chunk
+        else:
+            self._chunks.append(chunk)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._file is not None:
+            self._file.close()
+        elif self._array is not None:
+            self._array.flush()
+            if self.rows != len(self._array):
+                raise ValueError(f"{self.path}: 写出 {self.rows} 行，与预分配的行数 {len(self._array)} 不一致")
+        else:
+            data = np.concatenate(self._chunks) if self._chunks else np.zeros(0)
+            if self.fmt == 'npz':
+                np.savez(self.path, data=data)
+            else:
+                np.save(self.path, data)
+
+def save_signal(path, data, fmt='txt', chunk_rows=CHUNK_ROWS):
+    """保存信号，返回实际写出的路径
+
+    txt 与 np.savetxt 的默认格式完全一致，但按块批量格式化，速度更快；npy / npz 为二进制格式。
+    """
+    data = np.asarray(data, dtype=np.float64)
+    with SignalWriter(path, fmt, data.shape, chunk_rows) as writer:
+        writer.write(data)
+    return writer.path
@@ -0,0 +1,157 @@
+"""report.py 输出的逐单元格检查：期望结果按原版 report.py 的规则在测试中逐项写出"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import report
+
+NAN = np.nan
+
+# 测试工作簿：{工作表名: [(G, H, L, M, Q), ...]}，None 为空单元格
+# 包含数值 G/H、非整数和空的 L、跨表重复的组，以及 0.1 这类 float32 无法精确表示的 Q 值
+SHEETS = {
+    '数据1': [
+        (7, 12, 85, 0, 0.1),
+        (7, 12, 100, 0, 0.3),
+        (7, 12, 60, 0, 0),
+        (9, 12, 99.5, 0, 0.7),  # 该组在L区间内只有 99.5，仍输出 85-100 工作表，但没有任何 L 列取值
+        ('A', 'HHHHHHHHHH-01', 115, 1, 0.1),
+        ('A', 'HHHHHHHHHH-01', 50, 1, 0),
+    ],
+    '数据2': [
+        (7, 12, 90, 0, 1 / 3),
+        (7, 12, None, 0, 0.5),
+        ('A', 'HHHHHHHHHH-01', 100, 1, 2.5),
+        ('B', 'x', 101, 1, 0),
+    ],
+}
+
+# 数值 G/H 含空值：含空值的整数列按 float64 读取（H_short 为 "6789012.0"），无空值的表仍为整数（"456789012"）；
+# 合并后 G 统一为浮点数，空 G 的行不参与分组
+NUMERIC_SHEETS = {
+    '数据1': [
+        (1, 123456789012, 85, 0, 0.5),
+        (1, None, 100, 0, 0.25),
+    ],
+    '数据2': [
+        (2, 123456789012, 85, 0, 1.5),
+        (None, 5, 100, 0, 2),
+    ],
+}
+
+SUMMARY_HEADER = ['G', 'H_short', 'H_full', 'M', 'Q@L85', 'Q@L100', 'Q@L115', 'First_L', 'First_Q', '数据来源']
+
+EXPECTED_SUMMARY = {
+    0: [
+        [7, '12', 12, 0, 0.1, 0.3, NAN, 85, 0.1, 2],
+        [9, '12', 12, 0, NAN, NAN, NAN, NAN, NAN, 1],
+    ],
+    1: [
+        ['A', 'HHHHHH-01', 'HHHHHHHHHH-01', 1, NAN, 2.5, 0.1, 100, 2.5, 2],
+        ['B', 'x', 'x', 1, NAN, NAN, NAN, NAN, NAN, 1],
+    ],
+}
+
+# 各组各L区间的 Q 值 {(G, H_short, M, 区间): {L: Q}}，空字典表示区间内只有非整数L
+EXPECTED_RANGES = {
+    (7, '12', 0, (85, 100)): {85: 0.1, 90: 1 / 3, 100: 0.3},
+    (7, '12', 0, (100, 115)): {100: 0.3},
+    (9, '12', 0, (85, 100)): {},
+    ('A', 'HHHHHH-01', 1, (85, 100)): {100: 2.5},
+    ('A', 'HHHHHH-01', 1, (100, 115)): {100: 2.5, 115: 0.1},
+    ('B', 'x', 1, (100, 115)): {101: 0},
+}
+
+# 空字符串的 H_short 写出后读回为空值
+NUMERIC_SUMMARY = {
+    0: [
+        [1, NAN, NAN, 0, NAN, 0.25, NAN, 100, 0.25, 1],
+        [1, '6789012.0', 123456789012, 0, 0.5, NAN, NAN, 85, 0.5, 1],
+        [2, '456789012', 123456789012, 0, 1.5, NAN, NAN, 85, 1.5, 1],
+    ],
+}
+
+NUMERIC_RANGES = {
+    (1.0, '', 0, (85, 100)): {100: 0.25},
+    (1.0, '', 0, (100, 115)): {100: 0.25},
+    (1.0, '6789012.0', 0, (85, 100)): {85: 0.5},
+    (2.0, '456789012', 0, (85, 100)): {85: 1.5},
+}
+
+def range_frame(rows, l_range):
+    """范围工作表的期望单元格：表头 G, H, M, L{lo}..L{hi}，每行为一个组"""
+    lo, hi = l_range
+    header = ['G', 'H', 'M'] + [f"L{l}" for l in range(lo, hi + 1)]
+    cells = [header] + [[g, h if h != '' else NAN, m] + [q_values.get(l, NAN) for l in range(lo, hi + 1)]
+                        for (g, h, m), q_values in rows]
+    return pd.DataFrame(cells, dtype=object)
+
+def expected_per_group_output(summary, ranges):
+    """--per-group-sheets 布局：每个 M 值先写各组的范围工作表，再写汇总表"""
+    sheets = {}
+    for m, summary_rows in summary.items():
+        for key, q_values in ranges.items():
+            g, h, group_m, l_range = key
+            if group_m == m:
+                name = report.sanitize_sheet_name(f"{g}_{h}_{l_range[0]}-{l_range[1]}_M{m}")
+                sheets[name] = range_frame([((g, h, m), q_values)], l_range)
+        sheets[f"Summary_M{m}"] = pd.DataFrame([SUMMARY_HEADER] + summary_rows, dtype=object)
+    return sheets
+
+def expected_default_output(summary, ranges):
+    """默认布局：各 M 值的汇总表，之后每个L区间一个汇总宽表（按 M、G、H 排序）"""
+    sheets = {f"Summary_M{m}": pd.DataFrame([SUMMARY_HEADER] + summary_rows, dtype=object)
+              for m, summary_rows in summary.items()}
+    for l_range in report.L_RANGES:
+        rows = [((g, h, m), q_values) for (g, h, m, key_range), q_values in ranges.items()
+                if key_range == l_range]
+        if rows:
+            sheets[f"Range_{l_range[0]}-{l_range[1]}"] = range_frame(rows, l_range)
+    return sheets
+
+def write_workbook(path, sheets):
+    """按 SHEETS 的格式写出测试工作簿，G/H/L/M/Q 分别位于 G、H、L、M、Q 列"""
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(str(path))
+    for name, rows in sheets.items():
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, [f"列{col + 1}" for col in range(18)])
+        for row_num, row in enumerate(rows, start=1):
+            for col, value in zip(report.COLUMN_INDICES, row):
+                if value is not None:
+                    worksheet.write(row_num, col, value)
+    workbook.close()
+
+def run_report(tmp_path, sheets, **kwargs):
+    """生成工作簿并运行 report，返回按单元格原值读取的所有输出工作表"""
+    input_file = os.path.join(tmp_path, 'numeric.xlsx')
+    write_workbook(input_file, sheets)
+    report.process_all_sheets(input_file, **kwargs)
+    output_file = f"{os.path.splitext(input_file)[0]}_combined_output.xlsx"
+    return pd.read_excel(output_file, sheet_name=None, header=None, dtype=object)
+
+def assert_same_sheets(actual, expected):
+    assert list(actual) == list(expected)
+    for sheet in expected:
+        pd.testing.assert_frame_equal(actual[sheet], expected[sheet], check_exact=True, obj=sheet)
+
+CASES = {
+    'mixed': (SHEETS, EXPECTED_SUMMARY, EXPECTED_RANGES),
+    'numeric_gh': (NUMERIC_SHEETS, NUMERIC_SUMMARY, NUMERIC_RANGES),
+}
+
+@pytest.mark.parametrize('case', CASES)
+@pytest.mark.parametrize('engine', report.ENGINES)
+def test_per_group_sheets(tmp_path, engine, case):
+    """--per-group-sheets 布局的所有工作表逐单元格一致，非整数L的组不丢失"""
+    sheets, summary, ranges = CASES[case]
+    actual = run_report(tmp_path, sheets, per_group_sheets=True, engine=engine)
+    assert_same_sheets(actual, expected_per_group_output(summary, ranges))
+
+@pytest.mark.parametrize('case', CASES)
+@pytest.mark.parametrize('engine', report.ENGINES)
+def test_default_layout(tmp_path, engine, case):
+    """默认布局的汇总表和范围宽表逐单元格一致"""
+    sheets, summary, ranges = CASES[case]
+    actual = run_report(tmp_path, sheets, engine=engine)
+    assert_same_sheets(actual, expected_default_output(summary, ranges))
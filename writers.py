@@ -0,0 +1,136 @@
+import os
+import time
+import profiling
+
+# 支持的输出格式（按扩展名识别）
+FORMATS = {'.xlsx': 'xlsx', '.csv': 'csv', '.parquet': 'parquet'}
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_SHEET_NAME = 31
+
+def detect_format(path, fmt=None):
+    """确定输出格式：优先使用显式指定的格式，否则按扩展名判断，默认 xlsx"""
+    if fmt:
+        if fmt not in FORMATS.values():
+            raise ValueError(f"不支持的输出格式: {fmt} (可选: {', '.join(FORMATS.values())})")
+        return fmt
+    return FORMATS.get(os.path.splitext(path)[1].lower(), 'xlsx')
+
+def _cell_rows(df):
+    """逐行产出可直接写入单元格的值，NaN/NaT 转为空单元格"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+class ResultWriter:
+    """多工作表结果写出器
+    
+    xlsx 使用 xlsxwriter 的 constant_memory 模式逐行流式写出，内存占用与行数无关；
+    csv / parquet 每个工作表写为一个文件 "{路径主干}_{工作表名}.{扩展名}"，便于下游流水线读取。
+    关闭时打印写出的总行数和吞吐量。
+    """
+    
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = detect_format(path, fmt)
+        self.rows_written = 0
+        self.sheets_written = 0
+        self.elapsed = 0.0
+        self._workbook = None
+        self._header_format = None
+        self._closed = False
+        self._sheet_names = set()
+        if self.fmt == 'xlsx':
+            import xlsxwriter
+            self._workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+            self._header_format = self._workbook.add_format({'bold': True, 'border': 1})
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def sheet_path(self, sheet_name):
+        """csv / parquet 模式下某个工作表对应的文件路径"""
+        return f"{os.path.splitext(self.path)[0]}_{sheet_name}.{self.fmt}"
+    
+    def _unique_sheet_name(self, sheet_name):
+        """工作表重名时追加序号，流式写出无法回到已写完的工作表"""
+        name = sheet_name
+        suffix = 2
+        while name.lower() in self._sheet_names:
+            tag = f"~{suffix}"
+            name = sheet_name[:EXCEL_MAX_SHEET_NAME - len(tag)] + tag
+            suffix += 1
+        self._sheet_names.add(name.lower())
+        return name
+    
+    def write_sheet(self, sheet_name, df):
+        """写出一个工作表，返回实际使用的工作表名"""
+        start = time.perf_counter()
+        sheet_name = self._unique_sheet_name(sheet_name)
+        with profiling.stage('write_sheet', sheet=sheet_name, format=self.fmt):
+            if self.fmt == 'xlsx':
+                self._write_xlsx_sheet(sheet_name, df)
+            else:
+                write_flat_file(df, self.sheet_path(sheet_name), self.fmt)
+            profiling.count('sheets_written')
+            profiling.count('rows_written', len(df))
+        self.elapsed += time.perf_counter() - start
+        self.rows_written += len(df)
+        self.sheets_written += 1
+        return sheet_name
+    
+    def _write_xlsx_sheet(self, sheet_name, df):
+        if len(df) + 1 > EXCEL_MAX_ROWS:
+            raise ValueError(f"工作表 {sheet_name} 共 {len(df)} 行，超过 Excel 行数上限，请改用 csv 或 parquet 格式")
+        
+        worksheet = self._workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(col) for col in df.columns], self._header_format)
+        for row_num, row in enumerate(_cell_rows(df), start=1):
+            worksheet.write_row(row_num, 0, row)
+    
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._workbook is not None:
+            # xlsx 在关闭时压缩打包，大结果文件的主要耗时在这里
+            start = time.perf_counter()
+            with profiling.stage('write_close', file=self.path):
+                self._workbook.close()
+            self.elapsed += time.perf_counter() - start
+        self._report()
+    
+    def _report(self):
+        rate = self.rows_written / self.elapsed if self.elapsed > 0 else 0
+        print(f"写出 {self.sheets_written} 个工作表, {self.rows_written} 行, "
+              f"用时 {self.elapsed:.2f}s ({rate:,.0f} 行/秒)")
+
+def write_flat_file(df, path, fmt):
+    """写出单个 csv / parquet 文件"""
+    if fmt == 'csv':
+        # utf-8-sig 便于 Excel 直接打开中文内容
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+    elif fmt == 'parquet':
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as e:
+            raise ImportError(f"写出 parquet 需要安装 pyarrow: {e}") from e
+    else:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+
+def write_frame(df, path, fmt=None, sheet_name='Sheet1'):
+    """写出单个结果表到 path，格式由 fmt 或扩展名决定"""
+    fmt = detect_format(path, fmt)
+    if fmt == 'xlsx':
+        with ResultWriter(path, fmt) as writer:
+            writer.write_sheet(sheet_name, df)
+        return
+    
+    start = time.perf_counter()
+    with profiling.stage('write_file', file=path, format=fmt):
+        write_flat_file(df, path, fmt)
+        profiling.count('rows_written', len(df))
+    elapsed = time.perf_counter() - start
+    rate = len(df) / elapsed if elapsed > 0 else 0
+    print(f"写出 {len(df)} 行, 用时 {elapsed:.2f}s ({rate:,.0f} 行/秒)")
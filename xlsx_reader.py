@@ -0,0 +1,410 @@
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import posixpath
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+import profiling
+
+_DIGITS = '0123456789'
+
+def _resolve_part(base_dir, target):
+    """将关系文件中的 Target 解析为压缩包内的部件路径"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+def build_workbook_index(zip_ref):
+    """一次性建立工作簿索引
+    
+    通过 xl/_rels/workbook.xml.rels 把 workbook.xml 中每个 <sheet> 映射到真实的工作表部件，
+    返回按工作簿顺序排列的 {部件路径: {'name', 'compress_size', 'file_size', 'crc'}}。
+    """
+    index = {}
+    try:
+        with zip_ref.open('xl/_rels/workbook.xml.rels') as f:
+            rels = {
+                rel.get('Id'): _resolve_part('xl', rel.get('Target', ''))
+                for rel in ET.parse(f).getroot()
+                if rel.get('Type', '').endswith('/worksheet')
+            }
+        
+        with zip_ref.open('xl/workbook.xml') as f:
+            workbook = ET.parse(f).getroot()
+            ns = {'ns': workbook.tag.split('}')[0].strip('{')} if '}' in workbook.tag else {'ns': ''}
+        
+        for sheet in workbook.findall('.//ns:sheets/ns:sheet', ns):
+            # r:id 的命名空间在 transitional 和 strict 格式中不同，按本地名匹配
+            rel_id = next((v for k, v in sheet.attrib.items() if k.endswith('}id')), None)
+            part = rels.get(rel_id)
+            if part is None:
+                continue
+            info = zip_ref.getinfo(part)
+            index[part] = {
+                'name': sheet.get('name'),
+                'compress_size': info.compress_size,
+                'file_size': info.file_size,
+                'crc': info.CRC
+            }
+    except Exception as e:
+        print(f"读取工作簿索引错误: {e}")
+    
+    if not index:
+        # 工作簿结构不完整时退回到按文件名识别工作表
+        for info in zip_ref.infolist():
+            name = info.filename
+            if 'worksheets/sheet' in name.lower() and name.endswith('.xml'):
+                index[name] = {
+                    'name': posixpath.splitext(posixpath.basename(name))[0],
+                    'compress_size': info.compress_size,
+                    'file_size': info.file_size,
+                    'crc': info.CRC
+                }
+    return index
+
+def get_sheet_files(zip_ref, index=None):
+    """获取所有工作表XML文件路径（按工作簿中的顺序）"""
+    if index is None:
+        index = build_workbook_index(zip_ref)
+    return list(index)
+
+def get_cell_token(cell, ns):
+    """获取单元格原始值：共享字符串返回其索引(int)，其他类型返回文本(str)"""
+    if cell is None:
+        return ''
+    
+    if cell.get('t') == 'inlineStr':
+        is_node = cell.find('.//ns:is', ns)
+        if is_node is not None:
+            t_node = is_node.find('.//ns:t', ns)
+            return t_node.text if t_node is not None else ''
+    
+    elif cell.get('t') == 's':
+        v_node = cell.find('.//ns:v', ns)
+        if v_node is not None:
+            try:
+                return int(v_node.text)
+            except (TypeError, ValueError):
+                return ''
+    
+    v_node = cell.find('.//ns:v', ns)
+    return v_node.text if v_node is not None else ''
+
+def resolve_token(token, shared_strings):
+    """将 get_cell_token 的结果解析为文本"""
+    if isinstance(token, int):
+        try:
+            return shared_strings[token]
+        except IndexError:
+            return ''
+    return token if token is not None else ''
+
+def get_cell_value(cell, shared_strings, ns):
+    """获取单元格值，优化处理各种类型"""
+    return resolve_token(get_cell_token(cell, ns), shared_strings)
+
+def split_cell_ref(ref):
+    """拆分单元格引用，如 "AB1234" -> ("AB", 1234)，不使用正则"""
+    col = ref.rstrip(_DIGITS)
+    return col.upper(), int(ref[len(col):])
+
+def make_projection(columns):
+    """生成列投影集合，同时包含大小写形式，便于直接用引用中的列字母判断"""
+    return frozenset(c for col in columns for c in (col.upper(), col.lower()))
+
+def iter_sheet_rows(sheet_stream, columns):
+    """流式逐行读取工作表，只保留投影列中的单元格
+    
+    使用 iterparse 增量解析，每次只处理一个 <row>，处理完立即清理已解析的元素，
+    峰值内存不随工作表大小增长。不在 columns 中的单元格在任何字符串处理和取值之前即被跳过，
+    columns 为 None 时保留所有列。
+    产出 (行号, {列字母: <c>元素}, ns)；元素在下一次迭代时被清理，调用方需当场取值。
+    """
+    projection = make_projection(columns) if columns is not None else None
+    row_tag = None
+    sheet_data = None
+    ns = None
+    rows = cells_total = cells_kept = 0
+    
+    try:
+        for event, elem in ET.iterparse(sheet_stream, events=('start', 'end')):
+            if event == 'start':
+                # 定位 <sheetData>，之后每处理完一行就清空它，避免已解析的行堆积
+                if sheet_data is None and elem.tag.endswith('sheetData'):
+                    sheet_data = elem
+                    uri = elem.tag[1:elem.tag.index('}')] if '}' in elem.tag else ''
+                    ns = {'ns': uri}
+                    row_tag = f'{{{uri}}}row' if uri else 'row'
+                continue
+            
+            if elem.tag != row_tag:
+                continue
+            
+            cells = {}
+            row = None
+            for cell in elem:
+                if (ref := cell.get('r')):
+                    if row is None:
+                        row = split_cell_ref(ref)[1]
+                    col = ref.rstrip(_DIGITS)
+                    if projection is None or col in projection:
+                        cells[col.upper()] = cell
+            
+            if row is not None:
+                rows += 1
+                cells_total += len(elem)
+                cells_kept += len(cells)
+                yield row, cells, ns
+            sheet_data.clear()
+    finally:
+        # 计数只在结束（或提前关闭）时汇总一次，不增加逐行开销
+        profiling.count('rows_scanned', rows)
+        profiling.count('cells_scanned', cells_kept)
+        profiling.count('cells_skipped', cells_total - cells_kept)
+
+class SharedStrings:
+    """按需加载的共享字符串表
+    
+    只流式读取一遍 xl/sharedStrings.xml，并且只保留被引用到的 <si> 条目。
+    文本依次写入同一个字符串缓冲区，按 (索引数组, 偏移数组) 定位，不为每个条目保留 str 对象。
+    富文本 <si> 的多个 <r><t> 片段合并为一个值，拼音注释 <rPh> 不计入。
+    """
+    
+    def __init__(self, indices=None, offsets=None, buffer=''):
+        self._indices = indices if indices is not None else array('q')
+        self._offsets = offsets if offsets is not None else array('q', [0])
+        self._buffer = buffer
+    
+    @classmethod
+    def load(cls, zip_ref, wanted=None):
+        """读取共享字符串表，wanted 为需要保留的索引集合，None 表示全部保留"""
+        if wanted is not None and not wanted:
+            return cls()
+        
+        indices = array('q')
+        offsets = array('q', [0])
+        buffer = io.StringIO()
+        last_wanted = max(wanted) if wanted is not None else None
+        try:
+            with zip_ref.open('xl/sharedStrings.xml') as f:
+                root = None
+                si_index = 0
+                for event, elem in ET.iterparse(f, events=('start', 'end')):
+                    if event == 'start':
+                        if root is None:
+                            root = elem
+                            uri = elem.tag[1:elem.tag.index('}')] if '}' in elem.tag else ''
+                            prefix = f'{{{uri}}}' if uri else ''
+                            si_tag, t_tag, r_tag = prefix + 'si', prefix + 't', prefix + 'r'
+                        continue
+                    
+                    if elem.tag != si_tag:
+                        continue
+                    
+                    if wanted is None or si_index in wanted:
+                        parts = []
+                        for child in elem:
+                            if child.tag == t_tag:
+                                parts.append(child.text or '')
+                            elif child.tag == r_tag:
+                                t_node = child.find(t_tag)
+                                if t_node is not None:
+                                    parts.append(t_node.text or '')
+                        text = ''.join(parts)
+                        buffer.write(text)
+                        indices.append(si_index)
+                        offsets.append(offsets[-1] + len(text))
+                    
+                    root.clear()
+                    si_index += 1
+                    if last_wanted is not None and si_index > last_wanted:
+                        break
+        except KeyError:
+            pass  # 工作簿没有共享字符串表
+        except Exception as e:
+            print(f"共享字符串读取警告: {e}")
+        return cls(indices, offsets, buffer.getvalue())
+    
+    def __len__(self):
+        return len(self._indices)
+    
+    def __getitem__(self, index):
+        pos = bisect_left(self._indices, index)
+        if pos == len(self._indices) or self._indices[pos] != index:
+            raise IndexError(f"共享字符串索引 {index} 未加载")
+        return self._buffer[self._offsets[pos]:self._offsets[pos + 1]]
+
+def column_letter(index):
+    """将从0开始的列索引转为列字母，如 6 -> "G"，27 -> "AB\""""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+def _text_key(cell, ns):
+    """文本列单元格的字典键，空单元格和错误值返回 None
+    
+    共享字符串为索引(int)，数值为 ('n', 文本)、布尔值为 ('b', 文本)，解析时再转换类型，其他为文本。
+    """
+    if cell is None or cell.get('t') == 'e':
+        return None
+    token = get_cell_token(cell, ns)
+    if token == '':
+        return None
+    cell_type = cell.get('t')
+    if cell_type is None or cell_type == 'n':
+        return ('n', token)
+    if cell_type == 'b':
+        return ('b', token)
+    return token
+
+def _number_value(cell, ns):
+    """数值列单元格取值，空单元格、文本和错误值均按 NaN 处理"""
+    if cell is None or cell.get('t') in ('s', 'e'):
+        return np.nan
+    try:
+        return float(get_cell_token(cell, ns))
+    except ValueError:
+        return np.nan
+
+def read_sheet_columns(zip_ref, sheet_file, columns, numeric_columns=()):
+    """流式读取单个工作表的投影列，返回列式数据
+    
+    第一个含单元格的行视为表头；投影列全部为空的行不产出。
+    文本列按列分别建立本表字典，values 为各列编码对应的字典键，codes 为各列的 int32 编码（-1 表示空）；
+    数值列直接转为 float64。
+    """
+    text_columns = [col for col in columns if col not in numeric_columns]
+    values = {col: {} for col in text_columns}
+    codes = {col: array('i') for col in text_columns}
+    numbers = {col: array('d') for col in numeric_columns}
+    
+    header_seen = False
+    with zip_ref.open(sheet_file) as f, profiling.stage('read_sheet', part=sheet_file):
+        for _, cells, ns in iter_sheet_rows(profiling.timed_stream(f), columns):
+            if not header_seen:
+                header_seen = True
+                continue
+            if not cells:
+                continue
+            
+            for col in text_columns:
+                key = _text_key(cells.get(col), ns)
+                column_values = values[col]
+                codes[col].append(-1 if key is None else column_values.setdefault(key, len(column_values)))
+            for col in numeric_columns:
+                numbers[col].append(_number_value(cells.get(col), ns))
+    
+    return {
+        'values': {col: list(values[col]) for col in text_columns},
+        'codes': {col: np.frombuffer(codes[col], dtype=np.int32) for col in text_columns},
+        'numbers': {col: np.frombuffer(numbers[col], dtype=np.float64) for col in numeric_columns}
+    }
+
+def _resolve_key(key, shared_strings):
+    """将 _text_key 产生的字典键解析为单元格值
+
+    数值与 openpyxl + read_excel 一致：不含小数点和指数的文本直接按整数解析，其余按浮点数解析，整数值的浮点数转为 int。
+    """
+    if isinstance(key, tuple):
+        kind, text = key
+        if kind == 'b':
+            return text not in ('0', '')
+        try:
+            if '.' not in text and 'E' not in text and 'e' not in text:
+                return int(text)
+            number = float(text)
+        except ValueError:
+            return text
+        return int(number) if number.is_integer() else number
+    return resolve_token(key, shared_strings)
+
+def _resolve_columns(result, shared_strings, encode_text=False):
+    """将单个工作表的列式数据解析为 {列字母: ndarray}
+    
+    encode_text 为 True 时文本列保持字典编码，返回 (codes, values)，codes 中 -1 表示空值，
+    values 只包含该列自身出现过的值。
+    """
+    data = {}
+    for col, codes in result['codes'].items():
+        keys = result['values'][col]
+        values = np.empty(len(keys), dtype=object)
+        for i, key in enumerate(keys):
+            values[i] = _resolve_key(key, shared_strings)
+        
+        # 解析后为空文本的单元格同样按空值处理；末位对应编码 -1
+        remap = np.append(np.where(values == '', -1, np.arange(len(values))), -1).astype(np.int32)
+        codes = remap[codes]
+        data[col] = (codes, values) if encode_text else np.append(values, None)[codes]
+    data.update(result['numbers'])
+    return data
+
+# 工作进程内复用的压缩包句柄
+_worker_state = {}
+
+def _init_worker(file_path, profile_config=None):
+    """工作进程初始化：每个进程只打开一次压缩包，并按主进程配置启用性能记录"""
+    _worker_state['zip'] = zipfile.ZipFile(file_path)
+    profiling.configure(profile_config)
+
+def worker_zip():
+    """当前工作进程中已打开的工作簿，供 sheet_pool 中运行的任务使用"""
+    return _worker_state['zip']
+
+def sheet_pool(file_path, workers):
+    """按工作表并行的进程池：每个工作进程只打开一次工作簿，并沿用主进程的性能记录配置"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(file_path, profiling.get_config())
+    )
+
+def submit_largest_first(pool, index, sheet_files, task, *args):
+    """按工作表大小从大到小提交 task(sheet_file, *args)，缩短并行的尾部等待
+
+    返回 {sheet_file: future}，调用方仍按工作簿顺序取结果。
+    """
+    return {
+        sheet_file: pool.submit(task, sheet_file, *args)
+        for sheet_file in sorted(sheet_files, key=lambda p: index[p]['file_size'], reverse=True)
+    }
+
+def _read_sheet_task(sheet_file, columns, numeric_columns):
+    return read_sheet_columns(worker_zip(), sheet_file, columns, numeric_columns)
+
+def read_workbook_columns(file_path, columns, numeric_columns=(), workers=1, encode_text=False):
+    """只打开一次工作簿，流式读取各工作表的投影列
+    
+    columns 为需要读取的列字母，numeric_columns 中的列转为 float64，其余列为 object 数组；
+    encode_text 为 True 时其余列以字典编码 (codes, values) 返回，不按行展开为对象。
+    返回按工作簿顺序排列的 {工作表名: {列字母: ndarray}}。
+    workers > 1 时各工作表在进程池中并行读取，每个工作进程只打开一次工作簿，共享字符串在主进程统一按需加载。
+    """
+    columns = [col.upper() for col in columns]
+    numeric_columns = [col.upper() for col in numeric_columns]
+    with zipfile.ZipFile(file_path) as z:
+        index = build_workbook_index(z)
+        sheet_files = get_sheet_files(z, index)
+        
+        if workers > 1 and len(sheet_files) > 1:
+            with sheet_pool(file_path, min(workers, len(sheet_files))) as pool:
+                futures = submit_largest_first(pool, index, sheet_files, _read_sheet_task, columns, numeric_columns)
+                results = [futures[sheet_file].result() for sheet_file in sheet_files]
+        else:
+            results = [read_sheet_columns(z, sheet_file, columns, numeric_columns) for sheet_file in sheet_files]
+        
+        # 只加载实际引用到的共享字符串
+        wanted = {key for result in results for keys in result['values'].values()
+                  for key in keys if isinstance(key, int)}
+        with profiling.stage('shared_strings', wanted=len(wanted)):
+            shared_strings = SharedStrings.load(z, wanted)
+            data = {
+                index[sheet_file]['name']: _resolve_columns(result, shared_strings, encode_text)
+                for sheet_file, result in zip(sheet_files, results)
+            }
+        profiling.count('sheets_read', len(sheet_files))
+        return data